@@ -11,10 +11,14 @@ django.setup()
 # Django ASGI application
 django_asgi_app = get_asgi_application()
 
-# Main ASGI application (HTTP + WebSocket)
+from main.lifespan import lifespan_app
+from main.middleware import TokenAuthMiddleware
+
+# Main ASGI application (HTTP + WebSocket + lifespan)
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
+    "lifespan": lifespan_app,
     "websocket": AuthMiddlewareStack(
-        URLRouter(main.routing.websocket_urlpatterns)  
+        TokenAuthMiddleware(URLRouter(main.routing.websocket_urlpatterns))
     ),
 })
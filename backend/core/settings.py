@@ -90,6 +90,33 @@ DATABASES = {
     }
 }
 
+# --------------------------------------
+# CACHES
+# --------------------------------------
+# "series" holds rendered SeriesViewSet responses (see main/cache.py).
+# LocMemCache evicts least-recently-used entries once MAX_ENTRIES is hit.
+# Each worker process keeps its own bodies, but the catalog version and
+# Last-Modified they are keyed on live in "catalog-version", which every
+# worker on the host shares, so a write in one invalidates them all. Use
+# a network backend (Redis, Memcached) for both once workers span hosts;
+# their incr() is atomic, the file backend's is only per-process.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "series": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "series-catalog",
+        "TIMEOUT": 600,
+        "OPTIONS": {"MAX_ENTRIES": 2000, "CULL_FREQUENCY": 10},
+    },
+    "catalog-version": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "var" / "catalog-version",
+        "TIMEOUT": None,
+    },
+}
+
 # --------------------------------------
 # PASSWORD VALIDATION
 # --------------------------------------
@@ -146,19 +173,88 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",  # ✅ only this one
+        "main.authentication.CachedTokenAuthentication",  # ✅ only this one
     ],
     "DEFAULT_FILTER_BACKENDS": [
         "rest_framework.filters.SearchFilter",
         "django_filters.rest_framework.DjangoFilterBackend",
     ],
+    # Every list endpoint is paginated; see main/pagination.py for the
+    # per-viewset cursor/offset split and the hard maximum page sizes.
+    "DEFAULT_PAGINATION_CLASS": "main.pagination.EstimatedCountPagination",
+    "PAGE_SIZE": 20,
 }
 
+# Token → user lookups are cached per process (main/authentication.py).
+# Revocations in other workers take effect within TOKEN_CACHE_TTL seconds.
+TOKEN_CACHE_MAX_SIZE = 10000
+TOKEN_CACHE_TTL = 60
+
+# Series.image variants are rendered in a process pool (main/thumbnails.py)
+# after upload; 0 renders inline in the saving process.
+THUMBNAIL_WORKERS = 2
+
+# "Also watched" neighbours and per-user picks kept per series/user by
+# manage.py refresh_recommendations (main/recommendations.py).
+RECOMMENDATION_TOP_K = 20
+
+# Trending ranks are rebuilt from 5-minute activity buckets by
+# manage.py rollup_trending (run it every minute from cron).
+TRENDING_TOP_N = 50
+
 # --------------------------------------
 # CHANNEL LAYERS (WebSocket backend)
 # --------------------------------------
+# UnixSocketChannelLayer (main/layers.py) lets several ASGI worker processes
+# on one host share groups without an external broker. Use Redis when the
+# workers are spread across hosts.
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",  # use Redis in production
+        "BACKEND": "main.layers.UnixSocketChannelLayer",
+        "CONFIG": {
+            "path": os.path.join(BASE_DIR, "var", "channels"),
+            "capacity": 100,
+            "channel_capacity": {},
+        },
     }
 }
+
+# Chat messages are persisted write-behind (main/buffers.py): one bulk insert
+# per MAX_BATCH messages or MAX_DELAY seconds, whichever comes first. They
+# are numbered in that flush and broadcast after it, so MAX_DELAY is also
+# the worst-case delivery latency.
+CHAT_BUFFER_MAX_BATCH = 100
+CHAT_BUFFER_MAX_DELAY = 0.1
+CHAT_BUFFER_MAX_PENDING = 1000
+
+# Sockets reconnecting with ?after_seq=N are replayed from the last
+# RING_SIZE events each worker holds per room; larger gaps read at most
+# REPLAY_MAX rows from the database (main/buffers.py RoomHistory).
+CHAT_REPLAY_RING_SIZE = 200
+CHAT_REPLAY_MAX = 500
+
+# Chat sockets opened with ?batch=1 get the events of each tick (seconds)
+# coalesced into one {"batch": [...]} frame.
+CHAT_BATCH_TICK = 0.05
+
+# Inbound chat frames are token-bucket limited per socket and per room
+# (per worker process); RATE is frames per second, BURST the bucket size.
+# Every throttled frame uses one of STRIKES (refilled at STRIKE_RATE per
+# second); a socket out of strikes is closed with 4008. ?batch=1 sockets
+# queue at most OUTBOX_MAX frames, dropping the oldest, and are closed
+# after OVERFLOW_TICKS overflowing ticks in a row. See main/throttling.py.
+CHAT_SOCKET_RATE = 5
+CHAT_SOCKET_BURST = 10
+CHAT_ROOM_RATE = 50
+CHAT_ROOM_BURST = 100
+CHAT_SOCKET_STRIKES = 10
+CHAT_SOCKET_STRIKE_RATE = 1
+WEBSOCKET_OUTBOX_MAX = 256
+WEBSOCKET_OVERFLOW_TICKS = 20
+
+# Chat presence (main/presence.py): workers refresh their sockets every
+# HEARTBEAT seconds, rows silent for TTL seconds are expired, and online
+# count changes are pushed to a room at most once per PUSH_INTERVAL.
+PRESENCE_HEARTBEAT = 30
+PRESENCE_TTL = 90
+PRESENCE_PUSH_INTERVAL = 2.0
@@ -0,0 +1,382 @@
+import asyncio
+import atexit
+import json
+import time
+from bisect import bisect_right, insort
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .counters import next_message_seq
+from .models import Community, Message
+from .trending import record_activity
+
+
+# ======================================================
+# CHAT MESSAGE WRITE-BEHIND BUFFER
+# ======================================================
+class MessageWriteBuffer:
+    """
+    Per-process write-behind buffer for chat messages.
+
+    ``add`` only appends to an in-memory list; rows are written with one
+    ``bulk_create`` once ``max_batch`` messages are pending or ``max_delay``
+    seconds have passed since the first one, whichever comes first. Each
+    flush also numbers its rows, one seq reservation per room, and ``add``
+    returns a future for the message's seq (None if it was dropped). Once
+    ``max_pending`` rows are queued or handed to writes that have not
+    finished, producers wait for the write chain, so a stalled database
+    applies backpressure instead of growing memory.
+    """
+
+    def __init__(self, max_batch=100, max_delay=0.25, max_pending=1000):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.pending = []
+        # Batches taken by a write task but not written yet.
+        self._in_flight = []
+        self._timer = None
+        self._tasks = set()
+        self._last_write = None
+        self.flushes = 0
+        self.written = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    async def add(self, community_id, user_id, content):
+        written = asyncio.get_running_loop().create_future()
+        try:
+            row = (int(community_id), int(user_id), content, written)
+        except (TypeError, ValueError):
+            self.dropped += 1
+            written.set_result(None)
+            return written
+        self.pending.append(row)
+        if len(self.pending) >= self.max_batch:
+            self._spawn_flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.max_delay, self._spawn_flush)
+        if self.depth() >= self.max_pending:
+            await self.flush()
+        return written
+
+    def depth(self):
+        return len(self.pending) + sum(len(batch) for batch in self._in_flight)
+
+    def _spawn_flush(self):
+        batch = self._take_batch()
+        if batch:
+            self._schedule_write(batch)
+
+    def _schedule_write(self, batch):
+        # Chain each write onto the previous one so batches land in order.
+        previous = self._last_write
+        self._in_flight.append(batch)
+
+        async def write():
+            if previous is not None:
+                await previous
+            seqs = await sync_to_async(self._write)(batch)
+            for (*_, written), seq in zip(batch, seqs):
+                if not written.done():
+                    written.set_result(seq)
+
+        task = asyncio.ensure_future(write())
+        self._last_write = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def flush(self):
+        """Write what is pending and wait for every earlier write too."""
+        batch = self._take_batch()
+        if batch:
+            self._schedule_write(batch)
+        if self._last_write is not None:
+            await asyncio.shield(self._last_write)
+
+    async def drain(self):
+        """Flush everything still queued; used on ASGI lifespan shutdown (uvicorn)."""
+        await self.flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def drain_sync(self):
+        """
+        Flush at interpreter exit, when no event loop is left: the pending
+        rows and every batch a write task took but never wrote. Under daphne,
+        which sends no ASGI lifespan events, this is the only drain.
+        """
+        # Executor threads are joined before atexit hooks run, so a write
+        # that was in progress has finished and left _in_flight by now.
+        for batch in [*self._in_flight, self._take_batch()]:
+            if batch:
+                self._write(batch)
+
+    def _take_batch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self.pending = self.pending, []
+        return batch
+
+    def _write(self, batch):
+        """Save a batch; returns each row's seq, None where it was dropped."""
+        started = time.perf_counter()
+        seqs = [None] * len(batch)
+        try:
+            series_by_community = dict(
+                Community.objects.filter(id__in={row[0] for row in batch}).values_list("id", "series_id")
+            )
+            user_ids = set(
+                User.objects.filter(id__in={row[1] for row in batch}).values_list("id", flat=True)
+            )
+            kept = [
+                i for i, (c, u, _, _) in enumerate(batch) if c in series_by_community and u in user_ids
+            ]
+            rows = [
+                Message(community_id=batch[i][0], user_id=batch[i][1], content=batch[i][2]) for i in kept
+            ]
+            with transaction.atomic():
+                # One reservation per room in the batch, not one per message.
+                next_seq = {
+                    community_id: next_message_seq(community_id, count)
+                    for community_id, count in Counter(row.community_id for row in rows).items()
+                }
+                for row in rows:
+                    row.seq = next_seq[row.community_id]
+                    next_seq[row.community_id] += 1
+                Message.objects.bulk_create(rows)
+            for i, row in zip(kept, rows):
+                seqs[i] = row.seq
+            self.written += len(rows)
+            self.dropped += len(batch) - len(rows)
+            # bulk_create skips signals: feed the trending counters directly.
+            record_activity(messages=Counter(series_by_community[row.community_id] for row in rows))
+        except Exception as e:
+            if not any(seqs):
+                self.dropped += len(batch)
+            print("⚠️ Error flushing chat messages:", e)
+        finally:
+            self._in_flight = [taken for taken in self._in_flight if taken is not batch]
+            elapsed = (time.perf_counter() - started) * 1000
+            self.flushes += 1
+            self.last_flush_ms = elapsed
+            self.max_flush_ms = max(self.max_flush_ms, elapsed)
+            self.total_flush_ms += elapsed
+        return seqs
+
+    def stats(self):
+        return {
+            "depth": len(self.pending),
+            "in_flight": self.depth() - len(self.pending),
+            "flushes": self.flushes,
+            "written": self.written,
+            "dropped": self.dropped,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+        }
+
+
+message_buffer = MessageWriteBuffer(
+    max_batch=getattr(settings, "CHAT_BUFFER_MAX_BATCH", 100),
+    max_delay=getattr(settings, "CHAT_BUFFER_MAX_DELAY", 0.1),
+    max_pending=getattr(settings, "CHAT_BUFFER_MAX_PENDING", 1000),
+)
+atexit.register(message_buffer.drain_sync)
+
+
+# ======================================================
+# CHAT REPLAY RING
+# ======================================================
+def chat_frame(event, **extra):
+    """The JSON text a socket receives for a chat event."""
+    return json.dumps({
+        "seq": event.get("seq"),
+        "message": event["message"],
+        "username": event.get("username", "Unknown User"),
+        "timestamp": event.get("timestamp", ""),
+        **extra,
+    })
+
+
+def chat_event(seq, message, username, timestamp):
+    event = {
+        "type": "chat_message",
+        "seq": seq,
+        "message": message,
+        "username": username,
+        "timestamp": timestamp,
+    }
+    # Encoded once here; every socket in the room is sent these same bytes.
+    event["text"] = chat_frame(event)
+    return event
+
+
+def stored_chat_events(community_id, after_seq, before_seq=None, limit=500):
+    """
+    ``(events, upper)``: the newest ``limit`` persisted messages with
+    ``after_seq < seq <= upper``, oldest first, read through the
+    (community, seq) unique index. ``upper`` is ``before_seq - 1``, or the
+    room's ``last_seq`` when no bound is given.
+    """
+    if before_seq is not None:
+        upper = before_seq - 1
+    else:
+        # Read before the rows: seqs are reserved in the transaction that
+        # saves their messages, so everything up to here is visible.
+        upper = Community.objects.filter(pk=community_id).values_list("last_seq", flat=True).first() or 0
+    rows = (
+        Message.objects.filter(community_id=community_id, seq__gt=after_seq, seq__lte=upper)
+        .order_by("-seq")
+        .values_list("seq", "content", "user__username", "created_at")[:limit]
+    )
+    events = [
+        chat_event(seq, content, username, timezone.localtime(created_at).strftime("%H:%M"))
+        for seq, content, username, created_at in list(rows)[::-1]
+    ]
+    return events, upper
+
+
+class _Ring:
+    __slots__ = ("seqs", "events", "complete_after")
+
+    def __init__(self):
+        self.seqs = []
+        self.events = {}
+        # Every event with seq > complete_after is held (None: nothing known yet).
+        self.complete_after = None
+
+
+class RoomHistory:
+    """
+    Per-process ring of the last ``size`` chat events of every community
+    this worker has sockets in, used to resume reconnecting clients.
+
+    A room's ring only exists while a local consumer is attached, because it
+    is filled from the group messages this worker receives; once the last
+    socket leaves, the room's events stop arriving and the ring is dropped.
+    ``replay`` serves a gap from the ring when it covers it and otherwise
+    reads the older part from the database: concurrent reads of the same gap
+    share one query, at most ``max_reads`` run at once, and their rows seed
+    the ring so the rest of a reconnect storm is served from memory.
+    """
+
+    def __init__(self, size=200, max_replay=500, max_reads=4):
+        self.size = size
+        self.max_replay = max_replay
+        self.rooms = {}
+        self.listeners = Counter()
+        self._reads = {}
+        self._read_slots = asyncio.Semaphore(max_reads)
+        self.ring_replays = 0
+        self.db_reads = 0
+        self.coalesced_reads = 0
+
+    def attach(self, room):
+        self.listeners[room] += 1
+
+    def detach(self, room):
+        self.listeners[room] -= 1
+        if self.listeners[room] <= 0:
+            del self.listeners[room]
+            self.rooms.pop(room, None)
+
+    def record(self, room, event):
+        seq = event.get("seq")
+        if seq is None or room not in self.listeners:
+            return
+        ring = self.rooms.get(room)
+        if ring is None:
+            ring = self.rooms[room] = _Ring()
+        if seq in ring.events:
+            return
+        if ring.complete_after is None:
+            ring.complete_after = seq - 1
+        insort(ring.seqs, seq)
+        ring.events[seq] = event
+        if len(ring.seqs) > self.size:
+            dropped = ring.seqs.pop(0)
+            del ring.events[dropped]
+            ring.complete_after = max(ring.complete_after, dropped)
+
+    async def replay(self, room, after_seq):
+        """
+        ``(events, gap)``: the events after ``after_seq``, oldest first, and
+        None, or the first seq delivered after a gap that could not be
+        filled (more than ``max_replay`` messages, or seqs missing from the
+        table). Only an unbroken run up to the newest seq is ever replayed.
+
+        Events can reach the ring out of order (several workers, separate
+        flushes), so it is only trusted for an unbroken run of seqs; a hole
+        in it is read from the database like anything older.
+        """
+        ring = self.rooms.get(room) or _Ring()
+        held = [ring.events[seq] for seq in ring.seqs[bisect_right(ring.seqs, after_seq):]]
+        if ring.complete_after is not None and ring.complete_after <= after_seq:
+            first = after_seq + 1
+        else:
+            first = held[0]["seq"] if held else None
+        unbroken = first is not None and all(event["seq"] == first + i for i, event in enumerate(held))
+        if unbroken and first == after_seq + 1:
+            self.ring_replays += 1
+            return held, None
+
+        before_seq = first if unbroken else None
+        older, upper = await self._read(room, after_seq, before_seq)
+        resume_from = max(upper, after_seq) + 1
+        for event in reversed(older):
+            if event["seq"] != resume_from - 1:
+                break
+            resume_from -= 1
+        older = [event for event in older if event["seq"] >= resume_from]
+        # Held events the read already covered came back from the table.
+        held = [event for event in held if event["seq"] > upper]
+        for event in older:
+            self.record(room, event)
+        if room in self.listeners and all(event["seq"] == upper + 1 + i for i, event in enumerate(held)):
+            # Only a ring unbroken above the read extends down to it.
+            ring = self.rooms.setdefault(room, _Ring())
+            if ring.complete_after is None or ring.complete_after <= upper:
+                ring.complete_after = resume_from - 1
+        return older + held, resume_from if resume_from > after_seq + 1 else None
+
+    async def _read(self, room, after_seq, before_seq):
+        key = (room, after_seq, before_seq)
+        task = self._reads.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(room, after_seq, before_seq))
+            self._reads[key] = task
+            task.add_done_callback(lambda _: self._reads.pop(key, None))
+        else:
+            self.coalesced_reads += 1
+        return await asyncio.shield(task)
+
+    async def _fetch(self, room, after_seq, before_seq):
+        async with self._read_slots:
+            self.db_reads += 1
+            return await sync_to_async(stored_chat_events)(room, after_seq, before_seq, self.max_replay)
+
+    def stats(self):
+        return {
+            "rooms": len(self.rooms),
+            "events": sum(len(ring.seqs) for ring in self.rooms.values()),
+            "ring_replays": self.ring_replays,
+            "db_reads": self.db_reads,
+            "coalesced_reads": self.coalesced_reads,
+        }
+
+
+room_history = RoomHistory(
+    size=getattr(settings, "CHAT_REPLAY_RING_SIZE", 200),
+    max_replay=getattr(settings, "CHAT_REPLAY_MAX", 500),
+)
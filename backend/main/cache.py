@@ -0,0 +1,124 @@
+import hashlib
+import time
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+CATALOG_CACHE_ALIAS = "series"
+VERSION_CACHE_ALIAS = "catalog-version"
+VERSION_KEY = "series:catalog-version"
+MODIFIED_KEY = "series:catalog-modified"
+CACHEABLE_MEDIA_TYPE = "application/json"
+
+
+def catalog_cache():
+    return caches[CATALOG_CACHE_ALIAS]
+
+
+def version_cache():
+    return caches[VERSION_CACHE_ALIAS]
+
+
+def get_catalog_version():
+    """
+    Return ``(version, last_modified)`` for the series catalog.
+
+    Both live in a store shared by every worker process (the rendered
+    bodies stay in per-process memory), so a write seen by one worker
+    invalidates the others too. The version is seeded from the clock so
+    that a lost or reset store never reuses a number that older cached
+    entries were keyed on.
+    """
+    cache = version_cache()
+    current = cache.get_many([VERSION_KEY, MODIFIED_KEY])
+    if len(current) < 2:
+        seed_catalog_version()
+        current = cache.get_many([VERSION_KEY, MODIFIED_KEY])
+    return current[VERSION_KEY], current[MODIFIED_KEY]
+
+
+def seed_catalog_version():
+    now = time.time()
+    cache = version_cache()
+    cache.add(VERSION_KEY, int(now * 1000), timeout=None)
+    cache.add(MODIFIED_KEY, int(now), timeout=None)
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached catalog response after a write.
+
+    Call it through ``transaction.on_commit``: bumping before the commit
+    lets another worker cache the old rows under the new version.
+    """
+    cache = version_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Missing or evicted: re-seed from the clock. If another worker got
+        # there first, add() is a no-op and the incr lands on its value.
+        seed_catalog_version()
+        cache.incr(VERSION_KEY)
+    # Last-Modified has one-second resolution; always move it forward so a
+    # client that fetched earlier in the same second still revalidates.
+    modified = cache.get(MODIFIED_KEY, 0)
+    cache.set(MODIFIED_KEY, max(int(time.time()), modified + 1), timeout=None)
+
+
+# ======================================================
+# CACHED CATALOG MIXIN
+# ======================================================
+class CachedCatalogMixin:
+    """
+    Serve ``list``/``retrieve`` from a versioned response cache.
+
+    Keys combine the catalog version with the host, path and query string, so
+    a write only has to bump the version (see main/signals.py); stale entries
+    simply age out of the LRU.
+    Every response carries an ``ETag``/``Last-Modified`` pair and matching
+    conditional requests get a bodyless ``304``.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    def get_cache_key(self, request, version):
+        params = sorted(request.query_params.lists())
+        renderer = request.accepted_renderer.format
+        raw = f"{request.get_host()}|{request.path}|{params}|{renderer}"
+        return f"series:v{version}:{hashlib.md5(raw.encode()).hexdigest()}"
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        version, modified = get_catalog_version()
+        key = self.get_cache_key(request, version)
+        etag = f'"{key.rsplit(":", 1)[-1][:16]}-{version}"'
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=modified)
+        if not_modified is not None:
+            return not_modified
+
+        cached = catalog_cache().get(key)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code == 200 and self.is_cacheable(request):
+                response.add_post_render_callback(
+                    lambda rendered: catalog_cache().set(
+                        key, (rendered.content, rendered["Content-Type"])
+                    )
+                )
+
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(modified)
+        return response
+
+    def is_cacheable(self, request):
+        renderer = getattr(request, "accepted_renderer", None)
+        return renderer is not None and renderer.media_type == CACHEABLE_MEDIA_TYPE
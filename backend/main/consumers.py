@@ -1,73 +1,210 @@
+import asyncio
 import json
+from collections import deque
 from datetime import datetime
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
-from asgiref.sync import sync_to_async
-from django.contrib.auth.models import User
-from main.models import Message, Community
+from django.conf import settings
+from django.db import IntegrityError
+from main.buffers import chat_event, chat_frame, message_buffer, room_history
+from main.models import Community
+from main.presence import presence
+from main.throttling import socket_guard
+from main.utils import BROADCAST_GROUP, user_notification_group
+
+
+# -------------------------------
+# 📤 Outbound frames
+# -------------------------------
+class OutboxMixin:
+    """
+    ``send_text`` for already-encoded frames. With ``tick`` set, frames wait
+    in an outbox and a writer task sends what queued up during each tick as
+    one ``{"batch": [...]}`` frame.
+
+    The outbox holds at most ``socket_guard.outbox_max`` frames: past that
+    the oldest are dropped and counted (clients see the seq gap and resume
+    with ?after_seq), and a socket that overflows ``overflow_ticks`` ticks
+    in a row is closed with 4008. Frames sent without a tick go straight
+    to the server: under daphne ``send`` hands them to Twisted and returns
+    at once, however slowly the client reads, and the server exposes no
+    write-buffer depth to bound them by. Cap that in front of daphne (proxy
+    send timeouts) if it matters; the layer's ``capacity`` bounds each
+    channel's inbound queue.
+    """
+    tick = None
+    _writer = None
+
+    def start_outbox(self, tick=None):
+        self.tick = tick
+        if tick is None:
+            return
+        self.outbox = deque()
+        self._outbox_ready = asyncio.Event()
+        self._overflowed = False
+        self.overflow_ticks = 0
+        self._writer = asyncio.ensure_future(self._write_outbox())
+
+    def stop_outbox(self):
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+
+    async def send_text(self, text):
+        """Send an already-encoded frame, or queue it for the next tick."""
+        if self.tick is None:
+            await self.send(text_data=text)
+        elif self._writer is not None:
+            if len(self.outbox) >= socket_guard.outbox_max:
+                self.outbox.popleft()
+                socket_guard.dropped += 1
+                self._overflowed = True
+            self.outbox.append(text)
+            self._outbox_ready.set()
+
+    async def send_frames(self, texts):
+        if not texts:
+            return
+        if self.tick is not None:
+            # The frames are JSON already: join them, don't re-encode.
+            await self.send(text_data='{"batch": [' + ", ".join(texts) + "]}")
+            return
+        for text in texts:
+            await self.send(text_data=text)
+
+    async def _write_outbox(self):
+        while True:
+            await self._outbox_ready.wait()
+            await asyncio.sleep(self.tick)
+            self._outbox_ready.clear()
+            texts = list(self.outbox)
+            self.outbox.clear()
+            await self.send_frames(texts)
+            self.overflow_ticks = self.overflow_ticks + 1 if self._overflowed else 0
+            self._overflowed = False
+            if self.overflow_ticks >= socket_guard.overflow_ticks:
+                socket_guard.disconnected["overflow"] += 1
+                self._writer = None
+                await self.close(code=4008)
+                return
 
 
 # -------------------------------
 # 📢 Notification Consumer
 # -------------------------------
-class NotificationConsumer(AsyncWebsocketConsumer):
+class NotificationConsumer(OutboxMixin, AsyncWebsocketConsumer):
     async def connect(self):
-        """Connect all clients to a single 'notifications' group."""
-        self.group_name = "notifications"
+        """Join the site-wide broadcast group and, if signed in, the user's own group."""
+        self.group_name = BROADCAST_GROUP
+        self.user_group_name = None
         await self.channel_layer.group_add(self.group_name, self.channel_name)
+
+        user = self.scope.get("user")
+        if user is not None and user.is_authenticated:
+            self.user_group_name = user_notification_group(user.id)
+            await self.channel_layer.group_add(self.user_group_name, self.channel_name)
+
         await self.accept()
+        self.start_outbox()
         print("✅ WebSocket connected to notifications group")
 
         # Optional: send welcome message
-        await self.send(text_data=json.dumps({
+        await self.send_text(json.dumps({
             "message": "Connected to DiziDunya notifications 🎬"
         }))
 
     async def disconnect(self, close_code):
-        """Remove client from the notifications group."""
+        """Remove client from the notifications groups."""
+        self.stop_outbox()
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if self.user_group_name:
+            await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
         print("❌ WebSocket disconnected from notifications group")
 
     async def receive(self, text_data):
-        """Handle incoming messages (if frontend ever sends)."""
-        try:
-            data = json.loads(text_data)
-            message = data.get("message", "No message content")
-            await self.channel_layer.group_send(
-                self.group_name,
-                {
-                    "type": "send_notification",
-                    "message": message,
-                },
-            )
-        except Exception as e:
-            print("⚠️ Error receiving WebSocket data:", e)
+        """
+        Notifications only flow server → client. Client frames are ignored;
+        they used to be rebroadcast to every connected user.
+        """
 
     async def send_notification(self, event):
-        """Send a message to all connected clients."""
-        message = event.get("message", "")
-        await self.send(text_data=json.dumps({"message": message}))
+        """Forward a broadcast or personal notification to this socket."""
+        payload = {"message": event.get("message", "")}
+        if "notification" in event:
+            payload["notification"] = event["notification"]
+        await self.send_text(json.dumps(payload))
 
 
 # -------------------------------
 # 💬 Chat Consumer (Community Chat)
 # -------------------------------
-class ChatConsumer(AsyncWebsocketConsumer):
+class ChatConsumer(OutboxMixin, AsyncWebsocketConsumer):
+    joined = False
+
     async def connect(self):
-        """Join a specific community chat room."""
-        self.community_id = self.scope["url_route"]["kwargs"]["community_id"]
+        """
+        Join a specific community chat room. ``?after_seq=N`` replays the
+        messages after seq N before live delivery starts; ``?batch=1`` opts
+        into one ``{"batch": [...]}`` frame per CHAT_BATCH_TICK seconds.
+        """
+        self.community_id = int(self.scope["url_route"]["kwargs"]["community_id"])
         self.room_group_name = f"chat_{self.community_id}"
+        self.replayed = set()
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        self.bucket = socket_guard.socket_bucket()
+        self.strikes = socket_guard.strike_bucket()
+        self.broadcasts = set()
 
+        # Unknown rooms are refused before the handshake completes.
+        if not await Community.objects.filter(pk=self.community_id).aexists():
+            await self.close(code=4004)
+            return
+        try:
+            await presence.enter(self.community_id, self.channel_name)
+        except IntegrityError:
+            # Deleted since the check above.
+            await self.close(code=4004)
+            return
+        self.joined = True
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+        room_history.attach(self.community_id)
         await self.accept()
+        batch = query.get("batch") == ["1"]
+        self.start_outbox(getattr(settings, "CHAT_BATCH_TICK", 0.05) if batch else None)
         print(f"✅ Joined chat room: {self.room_group_name}")
 
+        try:
+            after_seq = int(query["after_seq"][0])
+        except (KeyError, ValueError):
+            return
+        # Live events queue up behind connect(); the ones already replayed
+        # are skipped in chat_message.
+        events, gap = await room_history.replay(self.community_id, after_seq)
+        if gap is not None:
+            await self.send(text_data=json.dumps({"gap": {"after_seq": after_seq, "before_seq": gap}}))
+        await self.send_frames([chat_frame(event, replay=True) for event in events])
+        self.replayed = {event["seq"] for event in events}
+
     async def disconnect(self, close_code):
         """Leave the chat room."""
+        if not self.joined:
+            return
+        self.stop_outbox()
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        room_history.detach(self.community_id)
+        await presence.leave(self.channel_name)
         print(f"❌ Left chat room: {self.room_group_name}")
 
     async def receive(self, text_data):
         """Handle incoming messages from clients."""
+        if not socket_guard.allow(self.bucket, self.community_id):
+            if not self.strikes.take():
+                # Still flooding after the warnings: cut it off.
+                socket_guard.disconnected["throttled"] += 1
+                await self.close(code=4008)
+                return
+            await self.send_text(json.dumps({"error": "Rate limit exceeded"}))
+            return
         try:
             data = json.loads(text_data)
             message_text = data.get("message", "")
@@ -75,36 +212,35 @@ class ChatConsumer(AsyncWebsocketConsumer):
             user_id = data.get("user_id")
 
             if message_text.strip():
-                await self.save_message(self.community_id, user_id, message_text)
-
-                # Broadcast message to all clients in the same room
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        "type": "chat_message",
-                        "message": message_text,
-                        "username": username,
-                        "timestamp": datetime.now().strftime("%H:%M"),
-                    },
-                )
+                written = await message_buffer.add(self.community_id, user_id, message_text)
+                timestamp = datetime.now().strftime("%H:%M")
+                task = asyncio.ensure_future(self.broadcast(written, message_text, username, timestamp))
+                self.broadcasts.add(task)
+                task.add_done_callback(self.broadcasts.discard)
         except Exception as e:
             print("⚠️ Error handling chat message:", e)
 
+    async def broadcast(self, written, message_text, username, timestamp):
+        """
+        Broadcast the message to the room once its batch is flushed and it
+        has a seq. Messages the buffer dropped (unknown user) still go out,
+        without a seq, as before.
+        """
+        seq = await written
+        await self.channel_layer.group_send(
+            self.room_group_name, chat_event(seq, message_text, username, timestamp)
+        )
+
     async def chat_message(self, event):
         """Send message to WebSocket clients."""
-        await self.send(text_data=json.dumps({
-            "message": event["message"],
-            "username": event.get("username", "Unknown User"),
-            "timestamp": event.get("timestamp", ""),
-        }))
+        room_history.record(self.community_id, event)
+        # Events can arrive out of seq order: skip exactly the ones replayed.
+        seq = event.get("seq")
+        if seq in self.replayed:
+            self.replayed.discard(seq)
+            return
+        await self.send_text(event.get("text") or chat_frame(event))
 
-    @sync_to_async
-    def save_message(self, community_id, user_id, content):
-        """Save messages to the database asynchronously."""
-        try:
-            community = Community.objects.filter(id=community_id).first()
-            user = User.objects.filter(id=user_id).first()
-            if community and user:
-                Message.objects.create(community=community, user=user, content=content)
-        except Exception as e:
-            print("⚠️ Error saving message:", e)
+    async def presence_update(self, event):
+        """Throttled online-count change for the room."""
+        await self.send_text(event["text"])
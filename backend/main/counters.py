@@ -0,0 +1,314 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Greatest, NullIf
+
+from .cache import bump_catalog_version
+from .models import (
+    Community,
+    LibraryChange,
+    Notification,
+    NotificationCounter,
+    Series,
+    SeriesStats,
+    Watchlist,
+    Wishlist,
+)
+from .trending import record_activity
+
+
+# ======================================================
+# UNREAD NOTIFICATION COUNTERS
+# ======================================================
+def adjust_unread(user_id, delta):
+    """
+    Apply ``delta`` to the user's counter with a single F() UPDATE.
+
+    Users without a counter row are left alone; ``unread_count`` seeds the
+    row from the table on first read, which already includes this change.
+    """
+    if delta:
+        NotificationCounter.objects.filter(user_id=user_id).update(unread=F("unread") + delta)
+
+
+def ensure_counter(user_id):
+    try:
+        with transaction.atomic():
+            counter, _ = NotificationCounter.objects.get_or_create(
+                user_id=user_id,
+                defaults={"unread": Notification.objects.filter(user_id=user_id, is_read=False).count()},
+            )
+    except IntegrityError:
+        counter = NotificationCounter.objects.get(user_id=user_id)
+    return counter
+
+
+def unread_count(user_id):
+    counter = NotificationCounter.objects.filter(user_id=user_id).only("unread").first()
+    return counter.unread if counter is not None else ensure_counter(user_id).unread
+
+
+def mark_read(user_id, ids=None):
+    """Mark the user's unread notifications (all, or just ``ids``) read in one UPDATE."""
+    with transaction.atomic():
+        unread = Notification.objects.filter(user_id=user_id, is_read=False)
+        if ids is not None:
+            unread = unread.filter(id__in=ids)
+        changed = unread.update(is_read=True)
+        adjust_unread(user_id, -changed)
+    return changed
+
+
+# ======================================================
+# COMMUNITY MEMBER COUNTS
+# ======================================================
+Membership = Community.members.through
+
+
+def join_community(community_id, user_id):
+    """
+    Insert-or-ignore the membership row and bump ``member_count`` only when a
+    row was really inserted. Two statements, safe against concurrent joins.
+    Returns True if the user joined.
+    """
+    table = connection.ops.quote_name(Membership._meta.db_table)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (community_id, user_id) VALUES (%s, %s) "
+                "ON CONFLICT DO NOTHING",
+                [community_id, user_id],
+            )
+            joined = cursor.rowcount == 1
+        if joined:
+            Community.objects.filter(pk=community_id).update(member_count=F("member_count") + 1)
+    return joined
+
+
+def leave_community(community_id, user_id):
+    """Delete the membership row and decrement only if one was removed."""
+    with transaction.atomic():
+        left, _ = Membership.objects.filter(community_id=community_id, user_id=user_id).delete()
+        if left:
+            Community.objects.filter(pk=community_id).update(member_count=F("member_count") - 1)
+    return bool(left)
+
+
+def actual_member_counts():
+    return Coalesce(
+        Subquery(
+            Membership.objects.filter(community_id=OuterRef("pk"))
+            .order_by()
+            .values("community_id")
+            .annotate(total=Count("id"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def reconcile_member_counts(dry_run=False):
+    """Rewrite drifted ``member_count`` values; returns the communities fixed."""
+    drifted = Community.objects.alias(actual=actual_member_counts()).exclude(member_count=F("actual"))
+    if dry_run:
+        return drifted.count()
+    return drifted.update(member_count=actual_member_counts())
+
+
+# ======================================================
+# CHAT MESSAGE SEQUENCES
+# ======================================================
+def next_message_seq(community_id, count=1):
+    """
+    Reserve ``count`` consecutive Message.seq values for the room with one
+    ``UPDATE ... RETURNING``, so every worker process draws from the same
+    monotonic counter. Returns the first one, or None if the community does
+    not exist. Run it in the transaction that saves the messages, so a failed
+    write gives the numbers back.
+    """
+    table = connection.ops.quote_name(Community._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET last_seq = last_seq + %s WHERE id = %s RETURNING last_seq",
+            [count, community_id],
+        )
+        # fetchall, not fetchone: SQLite keeps the UPDATE open until its
+        # RETURNING rows are exhausted.
+        rows = cursor.fetchall()
+    return rows[0][0] - count + 1 if rows else None
+
+
+# ======================================================
+# LIBRARY CHANGE HOOKS
+# ======================================================
+def insert_library_rows(model, user_id, series_ids):
+    """
+    Insert-or-ignore ``model`` rows for the user with one ``INSERT ... ON
+    CONFLICT DO NOTHING RETURNING``. Returns the series ids really inserted,
+    so a concurrent or retried add of the same rows is only counted once.
+    """
+    series_ids = sorted(series_ids)
+    if not series_ids:
+        return set()
+    fields = [f for f in model._meta.concrete_fields if not f.primary_key]
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+    placeholders = "(" + ", ".join(["%s"] * len(fields)) + ")"
+    params = []
+    for series_id in series_ids:
+        row = model(user_id=user_id, series_id=series_id)
+        params += [f.get_db_prep_save(f.pre_save(row, True), connection) for f in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) VALUES {', '.join([placeholders] * len(series_ids))} "
+            f"ON CONFLICT DO NOTHING RETURNING {connection.ops.quote_name('series_id')}",
+            params,
+        )
+        return {series_id for (series_id,) in cursor.fetchall()}
+
+
+def library_changed(user_id, series_ids, added, stats=None):
+    """
+    Record library adds/removes for the derived tables. Called from the
+    library signals, and explicitly by bulk paths that skip them; ``stats``
+    are the SeriesStats deltas each of the rows contributes.
+    """
+    series_ids = list(series_ids)
+    if not series_ids:
+        return
+    LibraryChange.objects.bulk_create(
+        LibraryChange(user_id=user_id, series_id=series_id) for series_id in series_ids
+    )
+    if added:
+        record_activity(library_adds={series_id: 1 for series_id in series_ids})
+    if stats:
+        adjust_series_stats(series_ids, stats)
+
+
+# ======================================================
+# SERIES STATS
+# ======================================================
+STATUS_COUNTS = {
+    "watching": "watching_count",
+    "planned": "planned_count",
+    "finished": "finished_count",
+}
+RATINGS = range(1, 6)
+
+
+def library_stat_deltas(row, sign=1):
+    """SeriesStats deltas for adding (``sign=1``) or removing a library row."""
+    if isinstance(row, Wishlist):
+        return {"wishlist_count": sign}
+    if not isinstance(row, Watchlist):
+        return {}
+    deltas = {}
+    if row.status in STATUS_COUNTS:
+        deltas[STATUS_COUNTS[row.status]] = sign
+    if row.rating in RATINGS:
+        deltas.update({"rating_count": sign, "rating_sum": sign * row.rating, f"rating_{row.rating}": sign})
+    return deltas
+
+
+def merge_deltas(*deltas):
+    merged = {}
+    for delta in deltas:
+        for field, value in delta.items():
+            merged[field] = merged.get(field, 0) + value
+    return {field: value for field, value in merged.items() if value}
+
+
+def adjust_series_stats(series_ids, deltas):
+    """
+    Apply ``deltas`` to the stats rows of ``series_ids`` in one F() UPDATE,
+    recomputing ``avg_rating`` in the same statement when ratings moved.
+    Series without a row yet are seeded from the library tables instead.
+    """
+    series_ids = list(series_ids)
+    deltas = merge_deltas(deltas)
+    if not series_ids or not deltas:
+        return
+    # Clamp decrements: drift (rows written around the hooks) must never
+    # fail the user's write; reconcile_series_stats repairs it.
+    updates = {
+        field: F(field) + value if value > 0 else Greatest(F(field) + value, 0)
+        for field, value in deltas.items()
+    }
+    if "rating_sum" in deltas or "rating_count" in deltas:
+        # UPDATE reads pre-update values, so apply the deltas here too.
+        updates["avg_rating"] = Coalesce(
+            Cast(F("rating_sum") + deltas.get("rating_sum", 0), FloatField())
+            / NullIf(F("rating_count") + deltas.get("rating_count", 0), 0),
+            Value(0.0),
+        )
+    updated = SeriesStats.objects.filter(series_id__in=series_ids).update(**updates)
+    if updated < len(series_ids):
+        ensure_series_stats(series_ids)
+    # The stats are part of the cached catalog bodies (and their ETags).
+    transaction.on_commit(bump_catalog_version)
+
+
+def series_stats_from_tables(series_ids=None):
+    """Recompute SeriesStats field values from the library tables."""
+    watchlist, wishlist = Watchlist.objects.all(), Wishlist.objects.all()
+    if series_ids is not None:
+        watchlist = watchlist.filter(series_id__in=series_ids)
+        wishlist = wishlist.filter(series_id__in=series_ids)
+    rated = Q(rating__in=RATINGS)
+    stats = {}
+    for row in watchlist.values("series_id").annotate(
+        rating_count=Count("id", filter=rated),
+        rating_sum=Coalesce(Sum("rating", filter=rated), 0),
+        **{field: Count("id", filter=Q(status=status)) for status, field in STATUS_COUNTS.items()},
+        **{f"rating_{r}": Count("id", filter=Q(rating=r)) for r in RATINGS},
+    ).order_by():
+        series_id = row.pop("series_id")
+        row["avg_rating"] = row["rating_sum"] / row["rating_count"] if row["rating_count"] else 0.0
+        stats[series_id] = row
+    for row in wishlist.values("series_id").annotate(total=Count("id")).order_by():
+        stats.setdefault(row["series_id"], {})["wishlist_count"] = row["total"]
+    return stats
+
+
+def ensure_series_stats(series_ids):
+    missing = set(series_ids) - set(
+        SeriesStats.objects.filter(series_id__in=series_ids).values_list("series_id", flat=True)
+    )
+    if missing:
+        computed = series_stats_from_tables(missing)
+        SeriesStats.objects.bulk_create(
+            [SeriesStats(series_id=series_id, **computed.get(series_id, {})) for series_id in missing],
+            ignore_conflicts=True,
+        )
+
+
+def reconcile_series_stats(dry_run=False, chunk_size=1000):
+    """
+    Create missing stats rows and rewrite drifted ones; returns the series
+    fixed. Works through the catalog ``chunk_size`` series at a time, in pk
+    order, so memory stays flat however large the catalog grows.
+    """
+    fields = [f.name for f in SeriesStats._meta.concrete_fields if f.name != "series"]
+    fixed, last_id = 0, 0
+    while True:
+        series_ids = list(
+            Series.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:chunk_size]
+        )
+        if not series_ids:
+            return fixed
+        last_id = series_ids[-1]
+        computed = series_stats_from_tables(series_ids)
+        existing = {stats.series_id: stats for stats in SeriesStats.objects.filter(series_id__in=series_ids)}
+        missing, drifted = [], []
+        for series_id in series_ids:
+            expected = SeriesStats(series_id=series_id, **computed.get(series_id, {}))
+            current = existing.get(series_id)
+            if current is None:
+                missing.append(expected)
+            elif any(getattr(current, f) != getattr(expected, f) for f in fields):
+                drifted.append(expected)
+        if not dry_run and (missing or drifted):
+            with transaction.atomic():
+                SeriesStats.objects.bulk_create(missing, ignore_conflicts=True)
+                SeriesStats.objects.bulk_update(drifted, fields, batch_size=500)
+                transaction.on_commit(bump_catalog_version)
+        fixed += len(missing) + len(drifted)
@@ -0,0 +1,51 @@
+import os
+
+from PIL import Image, ImageOps
+
+# Kept free of Django imports: this module is loaded by spawned pool workers.
+
+VARIANT_WIDTHS = (160, 320, 640, 1280)
+VARIANT_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def variant_name(directory, stem, width, fmt):
+    return f"{directory}/{stem}-{width}.{'jpg' if fmt == 'jpeg' else fmt}"
+
+
+def target_widths(source_width, widths=VARIANT_WIDTHS):
+    """Widths to render for a source; never upscale, always at least one."""
+    fitting = [w for w in widths if w < source_width]
+    return fitting or [min(source_width, min(widths))]
+
+
+def render_variants(source_path, media_root, directory, stem, widths=VARIANT_WIDTHS):
+    """
+    Write resized WebP/JPEG copies of ``source_path`` under
+    ``<media_root>/<directory>`` and return
+    ``(source_width, {"webp": {"160": name, ...}, "jpeg": {...}})`` with names
+    relative to ``media_root``.
+    """
+    os.makedirs(os.path.join(media_root, directory), exist_ok=True)
+    with Image.open(source_path) as image:
+        source_width = image.width
+        widths = target_widths(source_width, widths)
+        # Let the JPEG decoder downscale by DCT scaling before we resample.
+        image.draft("RGB", (max(widths), image.height * max(widths) // source_width))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+        variants = {fmt: {} for fmt in VARIANT_FORMATS}
+        for width in sorted(widths, reverse=True):
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+            for fmt, (pil_format, options) in VARIANT_FORMATS.items():
+                frame = resized.convert("RGB") if pil_format == "JPEG" else resized
+                name = variant_name(directory, stem, width, fmt)
+                frame.save(os.path.join(media_root, name), pil_format, **options)
+                variants[fmt][str(width)] = name
+            image = resized  # each smaller width resamples the previous one
+    return source_width, variants
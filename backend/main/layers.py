@@ -0,0 +1,280 @@
+import asyncio
+import json
+import os
+import struct
+import tempfile
+import uuid
+import weakref
+
+from channels.exceptions import ChannelFull
+from channels.layers import InMemoryChannelLayer
+from django.core.exceptions import ImproperlyConfigured
+
+FRAME_HEADER = struct.Struct("!I")
+
+
+def encode_frame(frame):
+    body = json.dumps(frame).encode()
+    return FRAME_HEADER.pack(len(body)) + body
+
+
+# ======================================================
+# UNIX SOCKET CHANNEL LAYER (multi-process, single host)
+# ======================================================
+class UnixSocketChannelLayer(InMemoryChannelLayer):
+    """
+    Channel layer shared by several worker processes on one host, no broker.
+
+    Every process keeps its own channels and groups in memory (inherited from
+    ``InMemoryChannelLayer``) and listens on ``<path>/<worker>.sock``. Channel
+    names embed the worker id, so ``send`` goes straight to the owning
+    process. Group membership is sharded by room on the filesystem: a worker
+    holding members of ``chat_7`` drops a marker in ``<path>/groups/g-chat_7/``
+    and ``group_send`` only forwards to the workers listed there.
+
+    Messages cross process boundaries as length-prefixed JSON, so they must be
+    JSON-serializable. ``path`` must be private to the server's user: it is
+    created 0700 and refused if anyone else can write to it. Per-channel
+    capacity is enforced by the receiving
+    process; frames for a full channel are dropped and counted. That is the
+    only bound on a consumer that falls behind its group.
+    """
+
+    def __init__(self, path=None, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path or os.path.join(tempfile.gettempdir(), f"dizidunya-channels-{os.getuid()}")
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.socket_path = self.peer_socket(self.worker_id)
+        self.groups_path = os.path.join(self.path, "groups")
+        self._make_private_dir(self.path)
+        os.makedirs(self.groups_path, mode=0o700, exist_ok=True)
+        self._server = None
+        self._home_loop = None
+        self._marked_groups = set()
+        self._writers = weakref.WeakKeyDictionary()
+        self.sent_remote = 0
+        self.received_remote = 0
+        self.dropped = 0
+        self.failed_sends = 0
+
+    @staticmethod
+    def _make_private_dir(path):
+        # Peers trust every socket and marker in here: an existing directory
+        # someone else owns or can write to would let them inject frames.
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        info = os.stat(path)
+        if info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise ImproperlyConfigured(
+                f"Channel layer path {path} must be owned by uid {os.getuid()} with mode 0700"
+            )
+
+    # -------------------------------
+    # Channel layer API
+    # -------------------------------
+    async def new_channel(self, prefix="specific"):
+        await self._ensure_server()
+        return f"{prefix}.{self.worker_id}!{uuid.uuid4().hex[:12]}"
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_channel_name(channel)
+        worker = self.channel_worker(channel)
+        if worker is None or (worker == self.worker_id and self._is_home_loop()):
+            try:
+                return await super().send(channel, message)
+            except ChannelFull:
+                # group_send swallows this: count it so slow consumers show.
+                self.dropped += 1
+                raise
+        await self._send_frame(worker, encode_frame({"op": "send", "channel": channel, "message": message}))
+
+    async def receive(self, channel):
+        await self._ensure_server()
+        return await super().receive(channel)
+
+    async def group_add(self, group, channel):
+        await self._ensure_server()
+        await super().group_add(group, channel)
+        if group not in self._marked_groups:
+            self._marked_groups.add(group)
+            marker_dir = self.group_dir(group)
+            os.makedirs(marker_dir, mode=0o700, exist_ok=True)
+            open(os.path.join(marker_dir, self.worker_id), "a").close()
+
+    async def group_discard(self, group, channel):
+        await super().group_discard(group, channel)
+        self._unmark_empty_groups()
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        self.require_valid_group_name(group)
+        data = None
+        for worker in self.group_workers(group):
+            if worker == self.worker_id and self._is_home_loop():
+                await super().group_send(group, message)
+                continue
+            # Encoded once, however many workers hold the group.
+            if data is None:
+                data = encode_frame({"op": "group", "group": group, "message": message})
+            await self._send_frame(worker, data, group=group)
+
+    async def flush(self):
+        await super().flush()
+        self._unmark_empty_groups()
+
+    async def close(self):
+        self.groups = {}
+        self._unmark_empty_groups()
+        for writer in self._writers.pop(asyncio.get_running_loop(), {}).values():
+            writer.close()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    # -------------------------------
+    # Routing helpers
+    # -------------------------------
+    def peer_socket(self, worker):
+        return os.path.join(self.path, f"{worker}.sock")
+
+    def group_dir(self, group):
+        return os.path.join(self.groups_path, f"g-{group}")
+
+    def channel_worker(self, channel):
+        if "!" not in channel:
+            return None
+        return self.non_local_name(channel)[:-1].rsplit(".", 1)[-1]
+
+    def group_workers(self, group):
+        try:
+            return os.listdir(self.group_dir(group))
+        except FileNotFoundError:
+            return []
+
+    def stats(self):
+        return {
+            "worker": self.worker_id,
+            "local_channels": len(self.channels),
+            "local_groups": len(self.groups),
+            "sent_remote": self.sent_remote,
+            "received_remote": self.received_remote,
+            "dropped": self.dropped,
+            "failed_sends": self.failed_sends,
+        }
+
+    def _clean_expired(self):
+        super()._clean_expired()
+        self._unmark_empty_groups()
+
+    def _unmark_empty_groups(self):
+        for group in self._marked_groups - set(self.groups):
+            self._marked_groups.discard(group)
+            self._unlink_marker(group, self.worker_id)
+
+    def _unlink_marker(self, group, worker):
+        try:
+            os.unlink(os.path.join(self.group_dir(group), worker))
+        except FileNotFoundError:
+            pass
+
+    def _is_home_loop(self):
+        return self._server is not None and asyncio.get_running_loop() is self._home_loop
+
+    # -------------------------------
+    # Transport
+    # -------------------------------
+    async def _ensure_server(self):
+        loop = asyncio.get_running_loop()
+        if self._server is not None and self._home_loop is loop:
+            return
+        if self._server is not None and not self._home_loop.is_closed():
+            raise RuntimeError("UnixSocketChannelLayer already serves another event loop")
+        # A previous home loop was closed (e.g. between tests): start afresh.
+        self.channels = {}
+        self.groups = {}
+        self._unmark_empty_groups()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._handle_peer, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self._home_loop = loop
+
+    async def _handle_peer(self, reader, writer):
+        try:
+            while True:
+                (size,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                frame = json.loads(await reader.readexactly(size))
+                self.received_remote += 1
+                await self._dispatch(frame)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            # Loop shutting down; end quietly instead of surfacing the
+            # cancellation through asyncio's connection callback.
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, frame):
+        if frame["op"] == "send":
+            try:
+                await InMemoryChannelLayer.send(self, frame["channel"], frame["message"])
+            except ChannelFull:
+                self.dropped += 1
+        elif frame["op"] == "group":
+            await InMemoryChannelLayer.group_send(self, frame["group"], frame["message"])
+
+    async def _send_frame(self, worker, data, group=None):
+        # Only the serving loop keeps connections open; short-lived loops
+        # (async_to_sync from sync views) connect, write and hang up.
+        keep_open = self._is_home_loop()
+        for attempt in range(2):
+            try:
+                writer = await self._get_writer(worker, keep_open)
+                writer.write(data)
+                await writer.drain()
+                if not keep_open:
+                    writer.close()
+                    await writer.wait_closed()
+                self.sent_remote += 1
+                return
+            except (FileNotFoundError, ConnectionRefusedError):
+                # No socket, or nobody listening on it: the worker is gone.
+                self._forget_worker(worker, group)
+                return
+            except OSError:
+                # Reset, timeout, full backlog...: the worker may well be
+                # alive, so retry on a fresh connection but keep its files.
+                self._drop_writer(worker)
+        self.failed_sends += 1
+
+    async def _get_writer(self, worker, keep_open):
+        if not keep_open:
+            _, writer = await asyncio.open_unix_connection(self.peer_socket(worker))
+            return writer
+        writers = self._writers.setdefault(asyncio.get_running_loop(), {})
+        writer = writers.get(worker)
+        if writer is None or writer.is_closing():
+            _, writer = await asyncio.open_unix_connection(self.peer_socket(worker))
+            writers[worker] = writer
+        return writer
+
+    def _drop_writer(self, worker):
+        writers = self._writers.get(asyncio.get_running_loop(), {})
+        writer = writers.pop(worker, None)
+        if writer is not None:
+            writer.close()
+
+    def _forget_worker(self, worker, group=None):
+        """The worker is gone: clear its stale socket and room marker."""
+        self._drop_writer(worker)
+        if worker == self.worker_id:
+            return
+        try:
+            os.unlink(self.peer_socket(worker))
+        except FileNotFoundError:
+            pass
+        if group is not None:
+            self._unlink_marker(group, worker)
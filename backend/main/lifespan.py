@@ -0,0 +1,22 @@
+from main.buffers import message_buffer
+from main.presence import presence
+
+
+async def lifespan_app(scope, receive, send):
+    """
+    ASGI lifespan handler: drains per-process buffers on server shutdown.
+
+    Only servers that speak the lifespan protocol (uvicorn, hypercorn) call
+    this. daphne does not: there the chat buffer is drained by its atexit
+    hook (MessageWriteBuffer.drain_sync) and presence rows expire after
+    PRESENCE_TTL.
+    """
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await message_buffer.drain()
+            await presence.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
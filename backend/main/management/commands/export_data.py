@@ -0,0 +1,51 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from main.exports import gzip_chunks, message_records, ndjson_chunks, parse_time_range, user_records
+from main.models import Community
+
+
+class Command(BaseCommand):
+    help = "Stream a community's chat history or a user's data as NDJSON."
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument("--community", type=int, help="Export this community's messages.")
+        target.add_argument("--user", help="Export everything held for this username.")
+        parser.add_argument("--since", help="Only rows created at or after this ISO date/time.")
+        parser.add_argument("--until", help="Only rows created before this ISO date/time.")
+        parser.add_argument("--gzip", action="store_true", help="Gzip the output.")
+        parser.add_argument("-o", "--output", default="-", help="Output file; '-' for stdout.")
+
+    def handle(self, *args, **options):
+        try:
+            time_range = parse_time_range(options["since"], options["until"])
+        except ValueError as e:
+            raise CommandError(e)
+
+        if options["community"] is not None:
+            if not Community.objects.filter(id=options["community"]).exists():
+                raise CommandError(f"Community {options['community']} does not exist.")
+            records = message_records(options["community"], time_range)
+        else:
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']!r} does not exist.")
+            records = user_records(user, time_range)
+
+        chunks = ndjson_chunks(records)
+        if options["gzip"]:
+            chunks = gzip_chunks(chunks)
+
+        if options["output"] == "-":
+            out = sys.stdout.buffer
+            for chunk in chunks:
+                out.write(chunk)
+            out.flush()
+        else:
+            with open(options["output"], "wb") as out:
+                for chunk in chunks:
+                    out.write(chunk)
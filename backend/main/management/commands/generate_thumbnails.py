@@ -0,0 +1,51 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main.imaging import render_variants
+from main.models import Series
+from main.thumbnails import current_variants, store_variants, variant_job
+
+
+class Command(BaseCommand):
+    help = "Render responsive WebP/JPEG variants for Series images that lack them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=max(1, getattr(settings, "THUMBNAIL_WORKERS", 2)),
+            help="Size of the rendering process pool.",
+        )
+        parser.add_argument(
+            "--force", action="store_true", help="Re-render series that already have variants."
+        )
+
+    def handle(self, *args, **options):
+        series = Series.objects.exclude(image="").exclude(image__isnull=True).only(
+            "id", "image", "image_variants"
+        )
+        todo = [s for s in series.iterator() if options["force"] or not current_variants(s)]
+        if not todo:
+            self.stdout.write(self.style.SUCCESS("All series images already have variants."))
+            return
+
+        rendered = failed = 0
+        pool = ProcessPoolExecutor(
+            max_workers=options["workers"], mp_context=multiprocessing.get_context("spawn")
+        )
+        with pool:
+            jobs = {pool.submit(render_variants, *variant_job(s)): s for s in todo}
+            for done, future in enumerate(as_completed(jobs), 1):
+                s = jobs[future]
+                try:
+                    source_width, variants = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"Series {s.pk} ({s.image.name}): {e}")
+                    continue
+                rendered += store_variants(s.pk, s.image.name, source_width, variants)
+                if done % 50 == 0:
+                    self.stdout.write(f"{done}/{len(todo)} images processed...")
+
+        self.stdout.write(self.style.SUCCESS(f"{rendered} series rendered, {failed} failed."))
@@ -0,0 +1,135 @@
+import csv
+import io
+import json
+import sys
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from main.cache import bump_catalog_version
+from main.models import Series, SeriesStats
+from main.utils import broadcast_notification
+
+IMPORT_FIELDS = ("title", "description", "genre", "release_year")
+
+
+def read_rows(stream, fmt):
+    """Yield one dict per input row without loading the file."""
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield {"_error": f"line {line_no}: {e}"}
+            continue
+        yield row if isinstance(row, dict) else {"_error": f"line {line_no}: not an object"}
+
+
+def clean_row(row):
+    """Validate a raw row against the Series field definitions."""
+    if "_error" in row:
+        raise ValidationError(row["_error"])
+    values = {}
+    for name in IMPORT_FIELDS:
+        field = Series._meta.get_field(name)
+        value = row.get(name)
+        if isinstance(value, str):
+            value = value.strip()
+        if value == "":
+            value = None
+        values[name] = field.clean(value, None)
+    return values
+
+
+class Command(BaseCommand):
+    help = "Stream Series rows from a CSV or JSONL feed into the catalog in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Feed file, or '-' for stdin.")
+        parser.add_argument(
+            "--format", choices=["csv", "jsonl"],
+            help="Input format; guessed from the file extension by default.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per bulk insert.")
+        parser.add_argument("--dry-run", action="store_true", help="Validate and count only.")
+        parser.add_argument(
+            "--no-notify", action="store_true", help="Skip the digest notification."
+        )
+
+    def handle(self, *args, **options):
+        path, batch_size = options["path"], options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive.")
+        fmt = options["format"] or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+
+        if path == "-":
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", newline="")
+        else:
+            try:
+                stream = open(path, encoding="utf-8-sig", newline="")
+            except OSError as e:
+                raise CommandError(f"Cannot read {path}: {e}")
+
+        self.totals = {"read": 0, "created": 0, "duplicates": 0, "invalid": 0}
+        # A dry run inserts nothing, so later batches would not see earlier
+        # ones in the database: remember the keys it would have created.
+        self.planned = set()
+        with stream:
+            rows = read_rows(stream, fmt)
+            while batch := list(islice(rows, batch_size)):
+                self.import_batch(batch, options["dry_run"])
+                self.stdout.write(
+                    "{read} read, {created} created, {duplicates} duplicates, {invalid} invalid".format(
+                        **self.totals
+                    )
+                )
+
+        created = self.totals["created"]
+        if created and not options["dry_run"]:
+            # bulk_create bypasses the Series signals and perform_create's
+            # per-row broadcast: invalidate and announce once for the whole feed.
+            bump_catalog_version()
+            if not options["no_notify"]:
+                broadcast_notification(f"{created} new Dizi added to the catalog")
+        verb = "would be imported" if options["dry_run"] else "imported"
+        self.stdout.write(self.style.SUCCESS(f"{created} series {verb}."))
+
+    def import_batch(self, batch, dry_run):
+        self.totals["read"] += len(batch)
+        candidates = {}
+        first_row = self.totals["read"] - len(batch) + 1
+        for offset, row in enumerate(batch):
+            try:
+                values = clean_row(row)
+            except ValidationError as e:
+                self.totals["invalid"] += 1
+                self.stderr.write(f"Row {first_row + offset}: {'; '.join(e.messages)}")
+                continue
+            key = (values["title"], values["release_year"])
+            if key in candidates:
+                self.totals["duplicates"] += 1
+            else:
+                candidates[key] = values
+
+        # One lookup per batch against the (title, release_year) index.
+        existing = set(
+            Series.objects.filter(title__in={title for title, _ in candidates}).values_list(
+                "title", "release_year"
+            )
+        )
+        if dry_run:
+            existing |= self.planned & candidates.keys()
+            self.planned |= candidates.keys() - existing
+        new = [Series(**values) for key, values in candidates.items() if key not in existing]
+        self.totals["duplicates"] += len(candidates) - len(new)
+        if new and not dry_run:
+            with transaction.atomic():
+                Series.objects.bulk_create(new)
+                SeriesStats.objects.bulk_create(SeriesStats(series=series) for series in new)
+        self.totals["created"] += len(new)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from main.counters import reconcile_member_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute Community.member_count from the membership table where it has drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only report how many communities drifted."
+        )
+
+    def handle(self, *args, **options):
+        fixed = reconcile_member_counts(dry_run=options["dry_run"])
+        verb = "would be fixed" if options["dry_run"] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{fixed} community member count(s) {verb}."))
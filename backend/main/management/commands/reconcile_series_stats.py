@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from main.counters import reconcile_series_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute SeriesStats rows from the library tables where they are missing or have drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only report how many series drifted."
+        )
+
+    def handle(self, *args, **options):
+        fixed = reconcile_series_stats(dry_run=options["dry_run"])
+        verb = "would be fixed" if options["dry_run"] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{fixed} series stats row(s) {verb}."))
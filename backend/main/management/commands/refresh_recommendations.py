@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.recommendations import refresh_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the precomputed similar-series and per-user recommendation tables "
+        "from library changes queued since the last run (or everything with --full)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Recompute every series and user.")
+        parser.add_argument("--top-k", type=int, help="Neighbours/picks kept per row.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        series, users = refresh_recommendations(full=options["full"], k=options["top_k"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {series} series and {users} users in {elapsed:.2f}s."
+        ))
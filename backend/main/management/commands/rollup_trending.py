@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from main.trending import rollup_trending
+
+
+class Command(BaseCommand):
+    help = "Rank trending series for each window from the activity buckets and prune old buckets."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, help="Series kept per window.")
+
+    def handle(self, *args, **options):
+        summary = rollup_trending(top_n=options["top"])
+        ranked = ", ".join(f"{window}: {rows}" for window, rows in summary.items())
+        self.stdout.write(self.style.SUCCESS(f"Trending rolled up ({ranked})."))
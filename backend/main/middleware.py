@@ -1,4 +1,8 @@
 # main/middleware.py
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
 from django.utils.deprecation import MiddlewareMixin
 
 class DisableCSRFMiddleware(MiddlewareMixin):
@@ -6,3 +10,26 @@ class DisableCSRFMiddleware(MiddlewareMixin):
     def process_request(self, request):
         if request.path.startswith("/api/"):
             setattr(request, "_dont_enforce_csrf_checks", True)
+
+
+@database_sync_to_async
+def get_token_user(key):
+    from rest_framework.exceptions import AuthenticationFailed
+    from main.authentication import CachedTokenAuthentication
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return None
+    return user
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """Authenticates WebSocket connections from a ``?token=<key>`` query param."""
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get("query_string", b"").decode())
+        key = (query.get("token") or [None])[0]
+        if key:
+            user = await get_token_user(key)
+            if user is not None:
+                scope = dict(scope, user=user)
+        return await super().__call__(scope, receive, send)
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_currentlywatching'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['community', 'created_at', 'id'], name='message_room_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+# SQLite only: an external-content FTS5 index over main_series, kept in sync
+# by triggers. Other backends keep using SearchFilter's LIKE lookups.
+FORWARD_SQL = [
+    """
+    CREATE VIRTUAL TABLE series_fts USING fts5(
+        title, description,
+        content='main_series', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER series_fts_ai AFTER INSERT ON main_series BEGIN
+        INSERT INTO series_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER series_fts_ad AFTER DELETE ON main_series BEGIN
+        INSERT INTO series_fts(series_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER series_fts_au AFTER UPDATE OF title, description ON main_series BEGIN
+        INSERT INTO series_fts(series_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO series_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    "INSERT INTO series_fts(series_fts) VALUES ('rebuild')",
+]
+
+REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS series_fts_au",
+    "DROP TRIGGER IF EXISTS series_fts_ad",
+    "DROP TRIGGER IF EXISTS series_fts_ai",
+    "DROP TABLE IF EXISTS series_fts",
+]
+
+
+def run_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_message_room_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sqlite(FORWARD_SQL), run_sqlite(REVERSE_SQL)),
+    ]
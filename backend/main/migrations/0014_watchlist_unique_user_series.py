@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:43
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Min
+
+
+def drop_duplicate_watchlist_rows(apps, schema_editor):
+    """Keep the oldest row per (user, series) so the unique index can be built."""
+    Watchlist = apps.get_model("main", "Watchlist")
+    keep = (
+        Watchlist.objects.values("user_id", "series_id")
+        .annotate(first_id=Min("id"))
+        .values_list("first_id", flat=True)
+    )
+    Watchlist.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_watchlist_rows, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='watchlist',
+            unique_together={('user', 'series')},
+        ),
+    ]
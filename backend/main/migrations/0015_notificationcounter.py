@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_unread_counters(apps, schema_editor):
+    Notification = apps.get_model("main", "Notification")
+    NotificationCounter = apps.get_model("main", "NotificationCounter")
+    unread = (
+        Notification.objects.filter(is_read=False)
+        .order_by()
+        .values("user_id")
+        .annotate(total=Count("id"))
+    )
+    NotificationCounter.objects.bulk_create(
+        NotificationCounter(user_id=row["user_id"], unread=row["total"]) for row in unread
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('main', '0014_watchlist_unique_user_series'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_unread_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:46
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_member_counts(apps, schema_editor):
+    Community = apps.get_model("main", "Community")
+    Membership = Community.members.through
+    counts = (
+        Membership.objects.filter(community_id=OuterRef("pk"))
+        .order_by()
+        .values("community_id")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    Community.objects.update(member_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_notificationcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='community',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_member_counts, migrations.RunPython.noop),
+    ]
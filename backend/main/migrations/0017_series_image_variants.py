@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:49
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+series_fts = import_module("main.migrations.0012_series_fts")
+
+# The JSON column adds a CHECK constraint, so SQLite rebuilds main_series and
+# drops the FTS sync triggers with the old table; put them back (in both
+# directions, since removing the column rebuilds the table again).
+TRIGGER_SQL = [sql for sql in series_fts.FORWARD_SQL if "CREATE TRIGGER" in sql]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_community_member_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, series_fts.run_sqlite(TRIGGER_SQL)),
+        migrations.AddField(
+            model_name='series',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(series_fts.run_sqlite(TRIGGER_SQL), migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_series_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='series',
+            index=models.Index(fields=['title', 'release_year'], name='series_title_year_idx'),
+        ),
+    ]
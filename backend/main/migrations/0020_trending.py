@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeriesActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('library_adds', models.PositiveIntegerField(default=0)),
+                ('messages', models.PositiveIntegerField(default=0)),
+                ('series', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='main.series')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='series_activity_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('series', 'bucket'), name='series_activity_bucket_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(max_length=8)),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('series', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.series')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('window', 'rank'), name='trending_window_rank_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:01
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+STATUS_COUNTS = {"watching": "watching_count", "planned": "planned_count", "finished": "finished_count"}
+RATINGS = range(1, 6)
+
+
+def backfill_series_stats(apps, schema_editor):
+    Series = apps.get_model("main", "Series")
+    SeriesStats = apps.get_model("main", "SeriesStats")
+    Watchlist = apps.get_model("main", "Watchlist")
+    Wishlist = apps.get_model("main", "Wishlist")
+
+    rated = Q(rating__in=RATINGS)
+    stats = {}
+    for row in Watchlist.objects.values("series_id").annotate(
+        rating_count=Count("id", filter=rated),
+        rating_sum=Coalesce(Sum("rating", filter=rated), 0),
+        **{field: Count("id", filter=Q(status=status)) for status, field in STATUS_COUNTS.items()},
+        **{f"rating_{r}": Count("id", filter=Q(rating=r)) for r in RATINGS},
+    ).order_by():
+        series_id = row.pop("series_id")
+        row["avg_rating"] = row["rating_sum"] / row["rating_count"] if row["rating_count"] else 0.0
+        stats[series_id] = row
+    for row in Wishlist.objects.values("series_id").annotate(total=Count("id")).order_by():
+        stats.setdefault(row["series_id"], {})["wishlist_count"] = row["total"]
+
+    SeriesStats.objects.bulk_create(
+        (SeriesStats(series_id=series_id, **stats.get(series_id, {}))
+         for series_id in Series.objects.values_list("id", flat=True).iterator()),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_trending'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='watchlist',
+            name='rating',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(5)]),
+        ),
+        migrations.CreateModel(
+            name='SeriesStats',
+            fields=[
+                ('series', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='main.series')),
+                ('wishlist_count', models.PositiveIntegerField(default=0)),
+                ('watching_count', models.PositiveIntegerField(default=0)),
+                ('planned_count', models.PositiveIntegerField(default=0)),
+                ('finished_count', models.PositiveIntegerField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_1', models.PositiveIntegerField(default=0)),
+                ('rating_2', models.PositiveIntegerField(default=0)),
+                ('rating_3', models.PositiveIntegerField(default=0)),
+                ('rating_4', models.PositiveIntegerField(default=0)),
+                ('rating_5', models.PositiveIntegerField(default=0)),
+                ('avg_rating', models.FloatField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-avg_rating', '-series'], name='series_stats_rating_idx'), models.Index(fields=['-wishlist_count', '-series'], name='series_stats_wishlist_idx'), models.Index(fields=['-watching_count', '-series'], name='series_stats_watching_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_series_stats, migrations.RunPython.noop),
+    ]
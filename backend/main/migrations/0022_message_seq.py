@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:06
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Max, OuterRef, Subquery, Window
+from django.db.models.functions import Coalesce, RowNumber
+
+
+def backfill_seqs(apps, schema_editor):
+    Community = apps.get_model("main", "Community")
+    Message = apps.get_model("main", "Message")
+    numbered = Message.objects.annotate(
+        number=Window(RowNumber(), partition_by=[F("community_id")], order_by=[F("created_at"), F("id")])
+    ).values_list("id", "number")
+    batch = []
+    for message_id, number in numbered.iterator(chunk_size=2000):
+        batch.append(Message(id=message_id, seq=number))
+        if len(batch) == 2000:
+            Message.objects.bulk_update(batch, ["seq"])
+            batch = []
+    Message.objects.bulk_update(batch, ["seq"])
+    last = (
+        Message.objects.filter(community_id=OuterRef("pk"))
+        .order_by()
+        .values("community_id")
+        .annotate(last=Max("seq"))
+        .values("last")
+    )
+    Community.objects.update(last_seq=Coalesce(Subquery(last), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_seriesstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='community',
+            name='last_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='seq',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_seqs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(fields=('community', 'seq'), name='message_room_seq_uniq'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_message_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='community',
+            name='online_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='RoomPresence',
+            fields=[
+                ('channel_name', models.CharField(max_length=200, primary_key=True, serialize=False)),
+                ('worker', models.CharField(db_index=True, max_length=64)),
+                ('last_seen', models.DateTimeField(db_index=True)),
+                ('community', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='presence', to='main.community')),
+            ],
+        ),
+    ]
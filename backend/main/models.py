@@ -1,3 +1,4 @@
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -10,9 +11,18 @@ class Series(models.Model):
     genre = models.CharField(max_length=100, blank=True, null=True)
     release_year = models.IntegerField(blank=True, null=True)
     image = models.ImageField(upload_to='series_images/', blank=True, null=True)
+    # Resized WebP/JPEG copies of ``image``; filled in by main/thumbnails.py.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='series', null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["genre", "-id"], name="series_genre_idx"),
+            models.Index(fields=["release_year", "-id"], name="series_year_idx"),
+            models.Index(fields=["title", "release_year"], name="series_title_year_idx"),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -47,7 +57,14 @@ class Watchlist(models.Model):
     series = models.ForeignKey(Series, on_delete=models.CASCADE, related_name='watchlisted_by')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='planned')
     notes = models.TextField(blank=True, null=True)
-    rating = models.IntegerField(default=0)
+    # 1–5 stars; 0 means not rated yet
+    rating = models.IntegerField(default=0, validators=[MinValueValidator(0), MaxValueValidator(5)])
+
+    class Meta:
+        unique_together = ("user", "series")
+        indexes = [
+            models.Index(fields=["user", "status"], name="watchlist_user_status_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.series.title} ({self.status})"
@@ -77,6 +94,11 @@ class Community(models.Model):
     language = models.CharField(max_length=50)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="created_communities")
     members = models.ManyToManyField(User, related_name="joined_communities", blank=True)
+    member_count = models.PositiveIntegerField(default=0)
+    # Highest chat Message.seq handed out in this room (counters.next_message_seq).
+    last_seq = models.PositiveBigIntegerField(default=0)
+    # Open chat sockets across all workers (main/presence.py).
+    online_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -90,15 +112,34 @@ class Message(models.Model):
     community = models.ForeignKey(Community, on_delete=models.CASCADE, related_name="messages")
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="messages")
     content = models.TextField()
+    # Monotonic per-room position, used by reconnecting sockets to resume.
+    seq = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["community", "created_at", "id"], name="message_room_keyset_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["community", "seq"], name="message_room_seq_uniq"),
+        ]
 
     def __str__(self):
         return f"{self.user.username}: {self.content[:30]}"
 
 
+# -------------------------------
+# ROOM PRESENCE MODEL
+# -------------------------------
+class RoomPresence(models.Model):
+    """One open chat socket, refreshed by its worker's heartbeat."""
+    channel_name = models.CharField(max_length=200, primary_key=True)
+    community = models.ForeignKey(Community, on_delete=models.CASCADE, related_name="presence")
+    worker = models.CharField(max_length=64, db_index=True)
+    last_seen = models.DateTimeField(db_index=True)
+
+
 # -------------------------------
 # POST MODEL
 # -------------------------------
@@ -110,6 +151,10 @@ class Post(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["community", "-created_at"], name="post_room_recent_idx"),
+            models.Index(fields=["-created_at"], name="post_recent_idx"),
+        ]
 
     def __str__(self):
         return f"Post by {self.user.username} in {self.community.series.title}"
@@ -126,6 +171,144 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="notif_user_recent_idx"),
+            models.Index(
+                fields=["user", "-created_at"],
+                condition=models.Q(is_read=False),
+                name="notif_user_unread_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} → {self.message[:30]}"
+
+
+# -------------------------------
+# NOTIFICATION COUNTER MODEL
+# -------------------------------
+class NotificationCounter(models.Model):
+    """Materialized unread count per user, kept in step with F() updates."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="notification_counter")
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+
+# -------------------------------
+# RECOMMENDATION MODELS
+# -------------------------------
+class SimilarSeries(models.Model):
+    """Precomputed top-K "also watched" neighbours (see main/recommendations.py)."""
+    series = models.ForeignKey(Series, on_delete=models.CASCADE, related_name="similar_rows")
+    similar = models.ForeignKey(Series, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["series", "rank"], name="similar_series_rank_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.series_id} ~ {self.similar_id} ({self.score:.3f})"
+
+
+class UserRecommendation(models.Model):
+    """Precomputed top-K series for a user, excluding their own library."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="recommendations")
+    series = models.ForeignKey(Series, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "rank"], name="user_recommendation_rank_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} → {self.series_id} ({self.score:.3f})"
+
+
+class LibraryChange(models.Model):
+    """
+    Queue of (user, series) library adds/removes since the last
+    recommendation refresh. Plain ids, so rows outlive deleted users/series.
+    """
+    user_id = models.BigIntegerField()
+    series_id = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.user_id}: {self.series_id}"
+
+
+# -------------------------------
+# TRENDING MODELS
+# -------------------------------
+class SeriesActivity(models.Model):
+    """Per-series activity counters in fixed time buckets (see main/trending.py)."""
+    series = models.ForeignKey(Series, on_delete=models.CASCADE, related_name="activity")
+    bucket = models.DateTimeField()
+    library_adds = models.PositiveIntegerField(default=0)
+    messages = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["series", "bucket"], name="series_activity_bucket_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["bucket"], name="series_activity_bucket_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.series_id} @ {self.bucket:%Y-%m-%d %H:%M}"
+
+
+class TrendingSeries(models.Model):
+    """Ranked trending series per window, rebuilt by ``manage.py rollup_trending``."""
+    window = models.CharField(max_length=8)
+    series = models.ForeignKey(Series, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["window", "rank"], name="trending_window_rank_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.window} #{self.rank}: {self.series_id}"
+
+
+# -------------------------------
+# SERIES STATS MODEL
+# -------------------------------
+class SeriesStats(models.Model):
+    """
+    Materialized engagement figures per series, kept in step with F()
+    updates on library writes (main/counters.py).
+    """
+    series = models.OneToOneField(Series, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    wishlist_count = models.PositiveIntegerField(default=0)
+    watching_count = models.PositiveIntegerField(default=0)
+    planned_count = models.PositiveIntegerField(default=0)
+    finished_count = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    avg_rating = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-avg_rating", "-series"], name="series_stats_rating_idx"),
+            models.Index(fields=["-wishlist_count", "-series"], name="series_stats_wishlist_idx"),
+            models.Index(fields=["-watching_count", "-series"], name="series_stats_watching_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.series_id}: {self.avg_rating:.2f} ({self.rating_count} ratings)"
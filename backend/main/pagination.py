@@ -0,0 +1,181 @@
+import base64
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, CursorPagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+# ======================================================
+# OFFSET PAGINATION — small tables, estimated count
+# ======================================================
+class EstimatedCountPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination whose ``count`` never scans a whole table.
+
+    Unfiltered querysets on PostgreSQL use the planner's row estimate; every
+    other queryset is counted at most ``count_limit`` rows past the current
+    offset (``count_is_estimate`` tells clients when the figure is a floor).
+    """
+    default_limit = 20
+    max_limit = 100
+    count_limit = 1000
+
+    def get_count(self, queryset):
+        self.count_is_estimate = False
+        estimate = self.get_table_estimate(queryset)
+        if estimate is not None:
+            self.count_is_estimate = True
+            return estimate
+        offset = self.get_offset(self.request)
+        window = queryset.order_by()[offset : offset + self.count_limit + 1].count()
+        if not window and offset:
+            # Past the end: the offset says nothing about the table size.
+            return queryset.count()
+        if window > self.count_limit:
+            self.count_is_estimate = True
+            window = self.count_limit
+        return offset + window
+
+    def get_table_estimate(self, queryset):
+        if queryset.query.where or queryset.query.is_sliced:
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if not row or row[0] < self.count_limit:
+            return None
+        return row[0]
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data["count_is_estimate"] = self.count_is_estimate
+        return response
+
+
+# ======================================================
+# CURSOR PAGINATION — large tables, no count
+# ======================================================
+class LargeTablePagination(CursorPagination):
+    """Count-free cursor pagination for tables that grow without bound."""
+    page_size = 20
+    page_size_query_param = "limit"
+    max_page_size = 100
+    ordering = "-id"
+
+
+class CreatedAtCursorPagination(LargeTablePagination):
+    """Cursor pagination for feeds ordered newest-first."""
+    ordering = "-created_at"
+
+
+# ======================================================
+# KEYSET PAGINATION — (created_at, id)
+# ======================================================
+class KeysetPagination(BasePagination):
+    """
+    Bidirectional keyset pagination over ``(created_at, id)``.
+
+    ``?limit=N`` returns the latest N rows, ``?before=<cursor>`` the N rows
+    just older than the cursor and ``?after=<cursor>`` the N rows just newer.
+    Pages are always returned oldest-first. Each page is one range scan of
+    ``limit + 1`` rows, plus an ``EXISTS`` probe for the far side of a
+    cursor; no ``COUNT(*)`` is ever issued.
+    """
+    page_size = 50
+    max_page_size = 200
+    limit_query_param = "limit"
+    before_query_param = "before"
+    after_query_param = "after"
+    invalid_cursor_message = "Invalid cursor"
+    both_cursors_message = "Pass either before or after, not both"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        before = self.decode_cursor(request.query_params.get(self.before_query_param))
+        after = self.decode_cursor(request.query_params.get(self.after_query_param))
+        if before is not None and after is not None:
+            raise ValidationError(self.both_cursors_message)
+
+        if after is not None:
+            created_at, pk = after
+            page = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            ).order_by("created_at", "id")
+            rows = list(page[: self.limit + 1])
+            self.has_newer = len(rows) > self.limit
+            # The page starts right after the cursor: older rows are those up to it.
+            self.has_older = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lte=pk)
+            ).exists()
+            rows = rows[: self.limit]
+        else:
+            page = queryset
+            if before is not None:
+                created_at, pk = before
+                page = page.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+                )
+            page = page.order_by("-created_at", "-id")
+            rows = list(page[: self.limit + 1])
+            self.has_older = len(rows) > self.limit
+            self.has_newer = before is not None and queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gte=pk)
+            ).exists()
+            rows = rows[: self.limit][::-1]
+
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.limit_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(limit, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.page or not self.has_newer:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.before_query_param)
+        return replace_query_param(url, self.after_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.page or not self.has_older:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.after_query_param)
+        return replace_query_param(url, self.before_query_param, self.encode_cursor(self.page[0]))
+
+    def encode_cursor(self, obj):
+        raw = f"{obj.created_at.isoformat()}|{obj.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            created_at, pk = raw.rsplit("|", 1)
+            created_at = parse_datetime(created_at)
+            if created_at is None:
+                raise ValueError
+            return created_at, int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import os
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Community, RoomPresence
+
+
+def uncount(community_id, removed):
+    if removed:
+        Community.objects.filter(pk=community_id).update(
+            online_count=Greatest(F("online_count") - removed, 0)
+        )
+
+
+# ======================================================
+# CHAT ROOM PRESENCE
+# ======================================================
+class PresenceRegistry:
+    """
+    Who is connected to which chat room, shared by every worker process.
+
+    Each open socket is a RoomPresence row and bumps Community.online_count
+    in the same transaction, so "N online" is a one-column read. A worker
+    refreshes ``last_seen`` on all of its rows with one UPDATE every
+    ``heartbeat`` seconds; rows left unrefreshed for ``ttl`` seconds belong to
+    a worker that died without saying goodbye and are swept, and uncounted,
+    by the next heartbeat of any live worker. Count changes are pushed to the
+    room at most once per ``push_interval`` seconds per worker.
+    """
+
+    def __init__(self, heartbeat=30, ttl=90, push_interval=2.0):
+        self.heartbeat = heartbeat
+        self.ttl = timedelta(seconds=ttl)
+        self.push_interval = push_interval
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.local = {}
+        self.pushed = {}
+        self._push_timers = {}
+        self._heartbeat_task = None
+        self._tasks = set()
+        self.heartbeats = 0
+        self.expired = 0
+        self.pushes = 0
+
+    # -------------------------------
+    # Socket lifecycle
+    # -------------------------------
+    async def enter(self, community_id, channel_name):
+        await sync_to_async(self._enter)(community_id, channel_name)
+        self.local[channel_name] = community_id
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.ensure_future(self._beat_forever())
+        self.schedule_push(community_id)
+
+    async def leave(self, channel_name):
+        community_id = self.local.pop(channel_name, None)
+        if community_id is None:
+            return
+        await sync_to_async(self._leave)(community_id, channel_name)
+        if not self.local and self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        self.schedule_push(community_id)
+
+    def _enter(self, community_id, channel_name):
+        with transaction.atomic():
+            RoomPresence.objects.create(
+                channel_name=channel_name,
+                community_id=community_id,
+                worker=self.worker_id,
+                last_seen=timezone.now(),
+            )
+            Community.objects.filter(pk=community_id).update(online_count=F("online_count") + 1)
+
+    def _leave(self, community_id, channel_name):
+        with transaction.atomic():
+            removed, _ = RoomPresence.objects.filter(channel_name=channel_name).delete()
+            uncount(community_id, removed)
+
+    # -------------------------------
+    # Heartbeat & expiry
+    # -------------------------------
+    async def _beat_forever(self):
+        while self.local:
+            for community_id in await sync_to_async(self.beat)():
+                self.schedule_push(community_id)
+            await asyncio.sleep(self.heartbeat)
+
+    def beat(self, now=None):
+        """Refresh this worker's rows and sweep expired ones; returns rooms that changed."""
+        now = now or timezone.now()
+        RoomPresence.objects.filter(worker=self.worker_id).update(last_seen=now)
+        self.heartbeats += 1
+        return self.sweep(now - self.ttl)
+
+    def sweep(self, cutoff):
+        stale = RoomPresence.objects.filter(last_seen__lt=cutoff)
+        swept = Counter()
+        for community_id in stale.values_list("community_id", flat=True).distinct():
+            # Delete, then uncount what this worker really removed, so two
+            # workers sweeping at once never uncount the same row twice.
+            with transaction.atomic():
+                removed, _ = stale.filter(community_id=community_id).delete()
+                uncount(community_id, removed)
+            if removed:
+                swept[community_id] = removed
+        self.expired += sum(swept.values())
+        return swept
+
+    async def close(self):
+        """Drop this worker's rows on clean shutdown instead of waiting for expiry."""
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        await sync_to_async(self._close)()
+
+    def _close(self):
+        for community_id in set(self.local.values()):
+            with transaction.atomic():
+                removed, _ = RoomPresence.objects.filter(
+                    worker=self.worker_id, community_id=community_id
+                ).delete()
+                uncount(community_id, removed)
+        self.local = {}
+
+    # -------------------------------
+    # Counts & pushes
+    # -------------------------------
+    @staticmethod
+    def online(community_id):
+        return (
+            Community.objects.filter(pk=community_id).values_list("online_count", flat=True).first() or 0
+        )
+
+    def schedule_push(self, community_id):
+        loop = asyncio.get_running_loop()
+        timer = self._push_timers.get(community_id)
+        if timer is not None and timer[0] is loop:
+            return
+        handle = loop.call_later(self.push_interval, self._spawn_push, community_id)
+        self._push_timers[community_id] = (loop, handle)
+
+    def _spawn_push(self, community_id):
+        self._push_timers.pop(community_id, None)
+        task = asyncio.ensure_future(self._push(community_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _push(self, community_id):
+        online = await sync_to_async(self.online)(community_id)
+        previous = self.pushed.get(community_id)
+        if online == previous:
+            return
+        if not online:
+            # Nobody left to tell: skip the fan-out.
+            self.pushed.pop(community_id, None)
+            return
+        self.pushed[community_id] = online
+        payload = {"online": online}
+        if previous is not None:
+            payload["change"] = online - previous
+        self.pushes += 1
+        await get_channel_layer().group_send(
+            f"chat_{community_id}",
+            {"type": "presence_update", **payload, "text": json.dumps({"presence": payload})},
+        )
+
+    def stats(self):
+        return {
+            "worker": self.worker_id,
+            "local_sockets": len(self.local),
+            "local_rooms": len(set(self.local.values())),
+            "heartbeats": self.heartbeats,
+            "expired": self.expired,
+            "pushes": self.pushes,
+        }
+
+
+presence = PresenceRegistry(
+    heartbeat=getattr(settings, "PRESENCE_HEARTBEAT", 30),
+    ttl=getattr(settings, "PRESENCE_TTL", 90),
+    push_interval=getattr(settings, "PRESENCE_PUSH_INTERVAL", 2.0),
+)
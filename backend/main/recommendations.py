@@ -0,0 +1,219 @@
+from itertools import chain, islice
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from scipy import sparse
+
+from .models import (
+    CurrentlyWatching,
+    LibraryChange,
+    SimilarSeries,
+    UserRecommendation,
+    Watchlist,
+    Wishlist,
+)
+
+LIBRARY_MODELS = (Wishlist, Watchlist, CurrentlyWatching)
+WRITE_CHUNK = 500
+SIMILAR_CHUNK = 1000
+
+
+def id_array(queryset, width=2):
+    """Stream a values_list queryset into an int64 array without a list of tuples."""
+    flat = chain.from_iterable(queryset.iterator(chunk_size=5000))
+    return np.fromiter(flat, dtype=np.int64).reshape(-1, width)
+
+
+def top_k(columns, scores, k):
+    """Best ``k`` positive scores, highest first; ties go to the lower column."""
+    keep = scores > 0
+    columns, scores = columns[keep], scores[keep]
+    if len(scores) > k:
+        best = np.argpartition(-scores, k - 1)[:k]
+        columns, scores = columns[best], scores[best]
+    order = np.lexsort((columns, -scores))
+    return columns[order], scores[order]
+
+
+def chunks(values, size=WRITE_CHUNK):
+    values = iter(values)
+    while batch := list(islice(values, size)):
+        yield batch
+
+
+# ======================================================
+# USER × SERIES MATRIX
+# ======================================================
+class LibraryMatrix:
+    """
+    Binary user × series CSR matrix: 1 if the series is in any of the user's
+    wishlist, watchlist or currently-watching rows. Ids are mapped to
+    contiguous indices through the sorted ``user_ids``/``series_ids`` arrays.
+    """
+
+    def __init__(self, pairs):
+        self.user_ids, users = np.unique(pairs[:, 0], return_inverse=True)
+        self.series_ids, series = np.unique(pairs[:, 1], return_inverse=True)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(pairs), dtype=np.float32), (users, series)),
+            shape=(len(self.user_ids), len(self.series_ids)),
+        )
+        matrix.data[:] = 1  # the same series in two lists counts once
+        self.matrix = matrix
+        self.by_series = matrix.tocsc()
+        self.popularity = np.asarray(matrix.sum(axis=0), dtype=np.float64).ravel()
+
+    @classmethod
+    def load(cls):
+        pairs = [id_array(model.objects.values_list("user_id", "series_id")) for model in LIBRARY_MODELS]
+        return cls(np.concatenate(pairs))
+
+    def user_index(self, ids):
+        return self._index(self.user_ids, ids)
+
+    def series_index(self, ids):
+        return self._index(self.series_ids, ids)
+
+    @staticmethod
+    def _index(known, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(known):
+            return np.empty(0, dtype=np.int64)
+        positions = np.searchsorted(known, ids).clip(max=len(known) - 1)
+        return positions[known[positions] == ids]
+
+    def items_of_users(self, user_idx):
+        return np.unique(self.matrix[user_idx].indices)
+
+    def users_of_series(self, series_idx):
+        return np.unique(self.by_series[:, series_idx].indices)
+
+    def similar(self, series_idx, k, chunk_size=SIMILAR_CHUNK):
+        """
+        Yield ``(series_index, neighbour_indices, scores)`` for each series in
+        ``series_idx``, scored by cosine similarity of their user columns:
+        co-occurrence / sqrt(popularity_i * popularity_j). The co-occurrence
+        product is built ``chunk_size`` series at a time, so a full run never
+        holds more than that many rows of it.
+        """
+        for start in range(0, len(series_idx), chunk_size):
+            chunk = series_idx[start:start + chunk_size]
+            cooc = (self.by_series[:, chunk].T @ self.matrix).tocsr()
+            rows = np.repeat(chunk, np.diff(cooc.indptr))
+            scores = cooc.data / np.sqrt(self.popularity[rows] * self.popularity[cooc.indices])
+            scores[cooc.indices == rows] = 0  # a series is not its own neighbour
+            for r, item in enumerate(chunk):
+                begin, end = cooc.indptr[r], cooc.indptr[r + 1]
+                yield (item, *top_k(cooc.indices[begin:end], scores[begin:end], k))
+
+    def similarity_matrix(self):
+        """Sparse series × series matrix of the stored top-K neighbour scores."""
+        rows = SimilarSeries.objects.values_list("series_id", "similar_id", "score")
+        triples = np.fromiter(
+            chain.from_iterable(rows.iterator(chunk_size=5000)), dtype=np.float64
+        ).reshape(-1, 3)
+        source = triples[:, 0].astype(np.int64)
+        target = triples[:, 1].astype(np.int64)
+        known = np.isin(source, self.series_ids) & np.isin(target, self.series_ids)
+        n = len(self.series_ids)
+        return sparse.csr_matrix(
+            (
+                triples[known, 2],
+                (np.searchsorted(self.series_ids, source[known]),
+                 np.searchsorted(self.series_ids, target[known])),
+            ),
+            shape=(n, n),
+        )
+
+    def recommend(self, user_idx, similarity, k):
+        """
+        Yield ``(user_index, series_indices, scores)``: the sum of neighbour
+        scores over the user's library, minus what they already have.
+        """
+        profile = self.matrix[user_idx]
+        scores = (profile @ similarity).tocsr()
+        scores = (scores - scores.multiply(profile)).tocsr()
+        for r, user in enumerate(user_idx):
+            start, end = scores.indptr[r], scores.indptr[r + 1]
+            yield (user, *top_k(scores.indices[start:end], scores.data[start:end], k))
+
+
+# ======================================================
+# REFRESH
+# ======================================================
+def refresh_recommendations(full=False, k=None):
+    """
+    Recompute the precomputed neighbour and recommendation tables.
+
+    Incremental runs consume the LibraryChange queue: neighbour lists are
+    rebuilt for every series whose cosine scores can have moved (everything
+    in the library of a changed user or of anyone holding a changed series),
+    and recommendations for the changed users. Other users' picks follow on
+    the next ``full`` run. Returns ``(series_refreshed, users_refreshed)``.
+    """
+    k = k or getattr(settings, "RECOMMENDATION_TOP_K", 20)
+    last_change = LibraryChange.objects.aggregate(last=Max("id"))["last"]
+    if last_change is None and not full:
+        return 0, 0
+
+    library = LibraryMatrix.load()
+    if full:
+        series_idx = np.arange(len(library.series_ids))
+        user_idx = np.arange(len(library.user_ids))
+        stale_series, stale_users = None, None
+    else:
+        changes = id_array(
+            LibraryChange.objects.filter(id__lte=last_change).values_list("user_id", "series_id")
+        )
+        changed_users, changed_series = np.unique(changes[:, 0]), np.unique(changes[:, 1])
+        user_idx = library.user_index(changed_users)
+        holders = library.users_of_series(library.series_index(changed_series))
+        series_idx = library.items_of_users(np.union1d(user_idx, holders))
+        stale_series = np.union1d(changed_series, library.series_ids[series_idx])
+        stale_users = changed_users
+
+    with transaction.atomic():
+        replace_rows(
+            SimilarSeries, "series_id", stale_series,
+            (
+                SimilarSeries(
+                    series_id=int(library.series_ids[item]),
+                    similar_id=int(library.series_ids[neighbour]),
+                    score=float(score),
+                    rank=rank,
+                )
+                for item, neighbours, scores in library.similar(series_idx, k)
+                for rank, (neighbour, score) in enumerate(zip(neighbours, scores), 1)
+            ),
+        )
+        similarity = library.similarity_matrix()
+        replace_rows(
+            UserRecommendation, "user_id", stale_users,
+            (
+                UserRecommendation(
+                    user_id=int(library.user_ids[user]),
+                    series_id=int(library.series_ids[item]),
+                    score=float(score),
+                    rank=rank,
+                )
+                for user, items, scores in library.recommend(user_idx, similarity, k)
+                for rank, (item, score) in enumerate(zip(items, scores), 1)
+            ),
+        )
+        if last_change is not None:
+            LibraryChange.objects.filter(id__lte=last_change).delete()
+    return len(series_idx), len(user_idx)
+
+
+def replace_rows(model, key, stale_ids, rows):
+    """Delete rows for ``stale_ids`` (all rows if None), then bulk insert ``rows``."""
+    if stale_ids is None:
+        model.objects.all().delete()
+    else:
+        for batch in chunks(int(i) for i in stale_ids):
+            model.objects.filter(**{f"{key}__in": batch}).delete()
+    rows = iter(rows)
+    while batch := list(islice(rows, WRITE_CHUNK)):
+        model.objects.bulk_create(batch)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
 from .models import (
     Series,
     Wishlist,
@@ -9,12 +10,26 @@ from .models import (
     Post,
     Notification,
     CurrentlyWatching,
+    SeriesStats,
 )
+from .thumbnails import current_variants
+
+SERIES_SUMMARY_FIELDS = ["id", "title", "image"]
+
 
 # ======================================================
 # SERIES SERIALIZER
 # ======================================================
+def media_url(request, name):
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
 class SeriesSerializer(serializers.ModelSerializer):
+    # {"webp": "<url> 160w, <url> 320w, ...", "jpeg": "..."}; empty until rendered
+    srcset = serializers.SerializerMethodField()
+    stats = serializers.SerializerMethodField()
+
     class Meta:
         model = Series
         fields = [
@@ -24,14 +39,83 @@ class SeriesSerializer(serializers.ModelSerializer):
             "genre",
             "release_year",
             "image",
+            "srcset",
+            "stats",
             "created_at",
         ]
 
+    def get_srcset(self, obj):
+        request = self.context.get("request")
+        return {
+            fmt: ", ".join(
+                f"{media_url(request, name)} {width}w"
+                for width, name in sorted(by_width.items(), key=lambda item: int(item[0]))
+            )
+            for fmt, by_width in current_variants(obj).items()
+        }
+
+    def get_stats(self, obj):
+        # Read from the materialized SeriesStats row; select_related("stats") upstream.
+        stats = getattr(obj, "stats", None) or SeriesStats()
+        return {
+            "avg_rating": round(stats.avg_rating, 2),
+            "rating_count": stats.rating_count,
+            "rating_histogram": {str(r): getattr(stats, f"rating_{r}") for r in range(1, 6)},
+            "watchers": {
+                "watching": stats.watching_count,
+                "planned": stats.planned_count,
+                "finished": stats.finished_count,
+                "total": stats.watching_count + stats.planned_count + stats.finished_count,
+            },
+            "wishlist_count": stats.wishlist_count,
+        }
+
+
+# ======================================================
+# SERIES SUMMARY + SPARSE FIELDSETS
+# ======================================================
+class SeriesSummarySerializer(serializers.ModelSerializer):
+    """Compact series card used by sparse library responses."""
+    class Meta:
+        model = Series
+        fields = SERIES_SUMMARY_FIELDS
+
+
+class SparseFieldsMixin:
+    """
+    ``?fields=id,series,...`` renders only the listed fields, and the nested
+    ``series`` collapses to SeriesSummarySerializer unless ``?expand=series``.
+    Without ``?fields`` the full representation is returned.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = requested_fields(self.context.get("request"))
+        if requested is None:
+            return
+        for name, field in list(self.fields.items()):
+            if name not in requested and not field.write_only:
+                self.fields.pop(name)
+        if "series" in self.fields and "series" not in expanded_fields(self.context.get("request")):
+            self.fields["series"] = SeriesSummarySerializer(read_only=True)
+
+
+def requested_fields(request):
+    fields = request.query_params.get("fields") if request is not None else None
+    if not fields:
+        return None
+    return {name.strip() for name in fields.split(",") if name.strip()}
+
+
+def expanded_fields(request):
+    expand = request.query_params.get("expand", "") if request is not None else ""
+    return {name.strip() for name in expand.split(",") if name.strip()}
+
 
 # ======================================================
 # WISHLIST SERIALIZER
 # ======================================================
-class WishlistSerializer(serializers.ModelSerializer):
+class WishlistSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
     series = SeriesSerializer(read_only=True)
     series_title = serializers.CharField(source="series.title", read_only=True)
@@ -56,7 +140,7 @@ class WishlistSerializer(serializers.ModelSerializer):
 # ======================================================
 # WATCHLIST SERIALIZER
 # ======================================================
-class WatchlistSerializer(serializers.ModelSerializer):
+class WatchlistSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
     series = SeriesSerializer(read_only=True)
     series_title = serializers.CharField(source="series.title", read_only=True)
@@ -83,7 +167,7 @@ class WatchlistSerializer(serializers.ModelSerializer):
 # ======================================================
 # CURRENTLY WATCHING SERIALIZER
 # ======================================================
-class CurrentlyWatchingSerializer(serializers.ModelSerializer):
+class CurrentlyWatchingSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
     series = SeriesSerializer(read_only=True)
     series_title = serializers.CharField(source="series.title", read_only=True)
@@ -110,9 +194,10 @@ class CurrentlyWatchingSerializer(serializers.ModelSerializer):
 class CommunitySerializer(serializers.ModelSerializer):
     series_title = serializers.CharField(source="series.title", read_only=True)
     series_image = serializers.ImageField(source="series.image", read_only=True)
+    series_thumbnail = serializers.SerializerMethodField()
     created_by_name = serializers.CharField(source="created_by.username", read_only=True)
-    member_count = serializers.SerializerMethodField()
-    members = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    member_count = serializers.IntegerField(read_only=True)
+    online_count = serializers.IntegerField(read_only=True)
 
     # For creation
     series_id = serializers.PrimaryKeyRelatedField(
@@ -122,24 +207,33 @@ class CommunitySerializer(serializers.ModelSerializer):
         queryset=User.objects.all(), source="created_by", write_only=True, required=False
     )
 
-    def get_member_count(self, obj):
-        return obj.members.count()
-
     class Meta:
         model = Community
         fields = [
             "id",
             "series_title",
             "series_image",
+            "series_thumbnail",
             "language",
             "created_by_name",
             "created_at",
             "member_count",
-            "members",
+            "online_count",
             "series_id",
             "created_by_id",
         ]
 
+    def get_series_thumbnail(self, obj):
+        """Smallest WebP variant for list tiles; the original until one exists."""
+        webp = current_variants(obj.series).get("webp")
+        if webp:
+            name = webp[min(webp, key=int)]
+        elif obj.series.image:
+            name = obj.series.image.name
+        else:
+            return None
+        return media_url(self.context.get("request"), name)
+
 
 # ======================================================
 # MESSAGE SERIALIZER
@@ -149,7 +243,7 @@ class MessageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Message
-        fields = ["id", "community", "user", "user_name", "content", "created_at"]
+        fields = ["id", "community", "user", "user_name", "content", "seq", "created_at"]
 
     def get_user_name(self, obj):
         return obj.user.username if obj.user else "Deleted User"
@@ -187,6 +281,12 @@ class PostSerializer(serializers.ModelSerializer):
 # ======================================================
 # USER SERIALIZER
 # ======================================================
+class CommunityMemberSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ["id", "username"]
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
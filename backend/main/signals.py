@@ -0,0 +1,159 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .cache import bump_catalog_version
+from .counters import (
+    adjust_series_stats,
+    adjust_unread,
+    library_changed,
+    library_stat_deltas,
+    merge_deltas,
+)
+from .models import Series, SeriesStats, Notification, Wishlist, Watchlist, CurrentlyWatching
+from .thumbnails import thumbnail_pipeline
+from .utils import push_notification
+
+
+# -------------------------------
+# SERIES CATALOG CACHE
+# -------------------------------
+@receiver(post_save, sender=Series)
+@receiver(post_delete, sender=Series)
+def invalidate_series_cache(sender, **kwargs):
+    """Any catalog write (API, admin or shell) invalidates cached responses."""
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Series)
+def create_series_stats(sender, instance, created, **kwargs):
+    if created:
+        SeriesStats.objects.bulk_create([SeriesStats(series=instance)], ignore_conflicts=True)
+
+
+# -------------------------------
+# SERIES IMAGE VARIANTS
+# -------------------------------
+IMAGE_DEFERRED = object()
+
+
+@receiver(post_init, sender=Series)
+def remember_image(sender, instance, **kwargs):
+    # Deferred loads (only()/defer()) leave image out of __dict__: unknown, not empty.
+    instance._saved_image = instance.__dict__.get("image", IMAGE_DEFERRED) if instance.pk else None
+
+
+@receiver(post_save, sender=Series)
+def render_image_variants(sender, instance, created, **kwargs):
+    """Queue resized copies whenever a new image is stored."""
+    if instance._saved_image is IMAGE_DEFERRED:
+        # No way to tell whether it changed; generate_thumbnails backfills.
+        return
+    image_name = instance.image.name if instance.image else None
+    if image_name and image_name != str(instance._saved_image or ""):
+        transaction.on_commit(lambda: thumbnail_pipeline.submit(instance))
+    instance._saved_image = image_name
+
+
+# -------------------------------
+# NOTIFICATION PUSH
+# -------------------------------
+@receiver(post_save, sender=Notification)
+def push_new_notification(sender, instance, created, **kwargs):
+    """Deliver new rows to the owner's sockets once the write is committed."""
+    if created:
+        transaction.on_commit(lambda: push_notification(instance))
+
+
+# -------------------------------
+# UNREAD COUNTERS
+# -------------------------------
+@receiver(post_init, sender=Notification)
+def remember_read_state(sender, instance, **kwargs):
+    # Deferred loads (only()/defer()) leave is_read out of __dict__; don't fetch it.
+    instance._saved_is_read = instance.__dict__.get("is_read") if instance.pk else None
+
+
+@receiver(post_save, sender=Notification)
+def count_unread_on_save(sender, instance, created, **kwargs):
+    if created:
+        delta = 0 if instance.is_read else 1
+    elif instance._saved_is_read is None or instance._saved_is_read == instance.is_read:
+        delta = 0
+    else:
+        delta = -1 if instance.is_read else 1
+    instance._saved_is_read = instance.is_read
+    adjust_unread(instance.user_id, delta)
+
+
+@receiver(post_delete, sender=Notification)
+def count_unread_on_delete(sender, instance, **kwargs):
+    if not instance.is_read:
+        adjust_unread(instance.user_id, -1)
+
+
+# -------------------------------
+# LIBRARY CHANGES
+# -------------------------------
+@receiver(post_init, sender=Watchlist)
+def remember_watch_state(sender, instance, **kwargs):
+    # As for notifications: skip deferred loads rather than fetching the fields.
+    saved = instance.__dict__
+    instance._saved_watch_state = (
+        (saved["status"], saved["rating"]) if instance.pk and "status" in saved and "rating" in saved else None
+    )
+
+
+@receiver(post_save, sender=Wishlist)
+@receiver(post_save, sender=Watchlist)
+@receiver(post_save, sender=CurrentlyWatching)
+def library_row_saved(sender, instance, created, **kwargs):
+    if created:
+        library_changed(
+            instance.user_id, [instance.series_id], added=True, stats=library_stat_deltas(instance)
+        )
+    elif sender is Watchlist and instance._saved_watch_state is not None:
+        status, rating = instance._saved_watch_state
+        adjust_series_stats(
+            [instance.series_id],
+            merge_deltas(
+                library_stat_deltas(Watchlist(status=status, rating=rating), sign=-1),
+                library_stat_deltas(instance),
+            ),
+        )
+    if sender is Watchlist:
+        instance._saved_watch_state = (instance.status, instance.rating)
+
+
+@receiver(post_delete, sender=Wishlist)
+@receiver(post_delete, sender=Watchlist)
+@receiver(post_delete, sender=CurrentlyWatching)
+def library_row_removed(sender, instance, origin=None, **kwargs):
+    if getattr(origin, "library_hooks_applied", False):
+        return  # BulkLibraryMixin.bulk_remove accounts for the whole batch
+    if isinstance(origin, Series) or getattr(origin, "model", None) is Series:
+        stats = None  # the stats row goes with the series
+    else:
+        if sender is Watchlist and instance._saved_watch_state is not None:
+            status, rating = instance._saved_watch_state
+            instance = Watchlist(user_id=instance.user_id, series_id=instance.series_id, status=status, rating=rating)
+        stats = library_stat_deltas(instance, sign=-1)
+    library_changed(instance.user_id, [instance.series_id], added=False, stats=stats)
+
+
+# -------------------------------
+# TOKEN CACHE INVALIDATION
+# -------------------------------
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    """Logout (and any other token delete) revokes the cached entry at once."""
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, **kwargs):
+    """Deactivation, permission changes etc. must not be served from cache."""
+    token_cache.invalidate_user(instance.pk)
@@ -1,3 +1,1810 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from collections import Counter
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Sum
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import numpy as np
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .models import (
+    Series,
+    Wishlist,
+    Watchlist,
+    Community,
+    Message,
+    Post,
+    Notification,
+    CurrentlyWatching,
+    LibraryChange,
+    RoomPresence,
+    SeriesActivity,
+    SeriesStats,
+    SimilarSeries,
+)
+from .authentication import TokenUserCache, token_cache
+from .buffers import (
+    MessageWriteBuffer, RoomHistory, chat_event, message_buffer, room_history, stored_chat_events,
+)
+from .cache import bump_catalog_version, catalog_cache, get_catalog_version, version_cache
+from .counters import insert_library_rows, next_message_seq, reconcile_member_counts, reconcile_series_stats
+from .exports import message_queryset, parse_time_range
+from .layers import UnixSocketChannelLayer
+from .middleware import TokenAuthMiddleware
+from .routing import websocket_urlpatterns
+from .thumbnails import current_variants, thumbnail_pipeline
+from .trending import record_activity, rollup_trending
+from .utils import broadcast_notification
+from .pagination import EstimatedCountPagination, KeysetPagination
+from .presence import PresenceRegistry, presence
+from .recommendations import LibraryMatrix
+from .throttling import TokenBucket, WebSocketGuard, socket_guard
+
+
+# ======================================================
+# COMMUNITY MESSAGES — KEYSET PAGINATION
+# ======================================================
+class CommunityMessagesPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="ayse", password="pw")
+        series = Series.objects.create(title="Kara Sevda", description="...")
+        cls.community = Community.objects.create(series=series, language="tr", created_by=cls.user)
+        Message.objects.bulk_create(
+            Message(community=cls.community, user=cls.user, content=f"msg {i}") for i in range(25)
+        )
+        cls.url = f"/api/communities/{cls.community.id}/messages/"
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def contents(self, response):
+        return [m["content"] for m in response.data["results"]]
+
+    def test_latest_page_is_oldest_first(self):
+        response = self.client.get(self.url, {"limit": 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.contents(response), [f"msg {i}" for i in range(15, 25)])
+        self.assertIsNone(response.data["next"])
+        self.assertIsNotNone(response.data["previous"])
+
+    def test_walk_backwards_and_forwards(self):
+        latest = self.client.get(self.url, {"limit": 10})
+        older = self.client.get(latest.data["previous"])
+        self.assertEqual(self.contents(older), [f"msg {i}" for i in range(5, 15)])
+        oldest = self.client.get(older.data["previous"])
+        self.assertEqual(self.contents(oldest), [f"msg {i}" for i in range(5)])
+        self.assertIsNone(oldest.data["previous"])
+
+        newer = self.client.get(oldest.data["next"])
+        self.assertEqual(self.contents(newer), [f"msg {i}" for i in range(5, 15)])
+
+    def test_links_follow_the_data(self):
+        latest = self.client.get(self.url, {"limit": 30})
+        self.assertIsNone(latest.data["next"])
+        first = Message.objects.order_by("created_at", "id").first()
+        cursor = KeysetPagination().encode_cursor(first)
+        response = self.client.get(self.url, {"after": cursor, "limit": 30})
+        self.assertEqual(len(response.data["results"]), 24)
+        self.assertIsNotNone(response.data["previous"])
+        # Once the cursor row is gone nothing older remains.
+        first.delete()
+        response = self.client.get(self.url, {"after": cursor, "limit": 30})
+        self.assertEqual(len(response.data["results"]), 24)
+        self.assertIsNone(response.data["previous"])
+
+    def test_before_and_after_together_are_rejected(self):
+        cursor = KeysetPagination().encode_cursor(Message.objects.first())
+        response = self.client.get(self.url, {"before": cursor, "after": cursor})
+        self.assertEqual(response.status_code, 400)
+
+    def test_never_counts(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url, {"limit": 10})
+        self.assertFalse(any("COUNT(" in q["sql"].upper() for q in ctx.captured_queries))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"before": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+
+# ======================================================
+# ROUTER LIST ENDPOINTS — BOUNDED PAGES
+# ======================================================
+class ListPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(User(username=f"user{i}") for i in range(30))
+        Series.objects.bulk_create(Series(title=f"Dizi {i}", description="...") for i in range(30))
+
+    def setUp(self):
+        catalog_cache().clear()
+        self.client = APIClient()
+
+    def test_offset_pages_are_capped(self):
+        response = self.client.get("/api/series/", {"limit": 1000})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 30)
+        self.assertEqual(response.json()["count"], 30)
+        self.assertFalse(response.json()["count_is_estimate"])
+
+        catalog_cache().clear()
+        with mock.patch.object(EstimatedCountPagination, "max_limit", 10):
+            response = self.client.get("/api/series/", {"limit": 1000})
+        self.assertEqual(len(response.json()["results"]), 10)
+
+    def test_count_is_bounded(self):
+        with mock.patch.object(EstimatedCountPagination, "count_limit", 10):
+            response = self.client.get("/api/series/", {"limit": 5})
+        self.assertEqual(response.json()["count"], 10)
+        self.assertTrue(response.json()["count_is_estimate"])
+        self.assertIsNotNone(response.json()["next"])
+
+    def test_offset_past_the_end_reports_the_real_count(self):
+        response = self.client.get("/api/series/", {"limit": 5, "offset": 5000})
+        self.assertEqual(response.json()["results"], [])
+        self.assertEqual(response.json()["count"], 30)
+        self.assertFalse(response.json()["count_is_estimate"])
+
+    def test_large_tables_use_cursor_without_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/users/", {"limit": 10})
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertNotIn("count", response.data)
+        self.assertFalse(any("COUNT(" in q["sql"].upper() for q in ctx.captured_queries))
+        second = self.client.get(response.data["next"])
+        self.assertEqual(len(second.data["results"]), 10)
+
+
+# ======================================================
+# QUERY BUDGETS — list endpoints must not N+1
+# ======================================================
+class QueryBudgetTests(TestCase):
+    """Each list endpoint runs in a fixed number of queries, whatever the page size."""
+    ROWS = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="elif", password="pw")
+        others = User.objects.bulk_create(User(username=f"fan{i}") for i in range(cls.ROWS))
+        series = Series.objects.bulk_create(
+            Series(title=f"Dizi {i}", description="...") for i in range(cls.ROWS)
+        )
+        communities = Community.objects.bulk_create(
+            Community(series=s, language="tr", created_by=others[i]) for i, s in enumerate(series)
+        )
+        for community in communities:
+            community.members.add(cls.user, *others[:3])
+        reconcile_member_counts()
+        cls.community = communities[0]
+        Message.objects.bulk_create(
+            Message(community=cls.community, user=u, content="merhaba") for u in others
+        )
+        Post.objects.bulk_create(
+            Post(community=c, user=others[i], content="...") for i, c in enumerate(communities)
+        )
+        Notification.objects.bulk_create(
+            Notification(user=u, message="hi") for u in others
+        )
+        Wishlist.objects.bulk_create(Wishlist(user=cls.user, series=s) for s in series)
+        Watchlist.objects.bulk_create(Watchlist(user=cls.user, series=s) for s in series)
+        CurrentlyWatching.objects.bulk_create(
+            CurrentlyWatching(user=cls.user, series=s) for s in series
+        )
+
+    def setUp(self):
+        catalog_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertWithinBudget(self, url, budget, params=None):
+        params = {"limit": self.ROWS, **(params or {})}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, url)
+        self.assertGreaterEqual(len(response.json()["results"]), self.ROWS, url)
+        self.assertLessEqual(
+            len(ctx.captured_queries), budget,
+            f"{url} ran {len(ctx.captured_queries)} queries (budget {budget})",
+        )
+
+    def test_catalog_budgets(self):
+        self.assertWithinBudget("/api/series/", 2)
+        self.assertWithinBudget("/api/users/", 1)
+
+    def test_community_budgets(self):
+        self.assertWithinBudget("/api/communities/", 2)
+        self.assertWithinBudget("/api/posts/", 1)
+        self.assertWithinBudget("/api/messages/", 2, {"community": self.community.id})
+        self.assertWithinBudget(f"/api/communities/{self.community.id}/messages/", 2)
+
+    def test_user_budgets(self):
+        self.assertWithinBudget("/api/notifications/", 1)
+        self.assertWithinBudget("/api/wishlist/", 2)
+        self.assertWithinBudget("/api/watchlist/", 2)
+        self.assertWithinBudget("/api/currently-watching/", 2)
+
+    def test_member_count_is_denormalized(self):
+        response = self.client.get(f"/api/communities/{self.community.id}/")
+        self.assertEqual(response.data["member_count"], 4)
+        self.assertNotIn("members", response.data)
+
+    def test_members_are_paginated(self):
+        url = f"/api/communities/{self.community.id}/members/"
+        with self.assertNumQueries(2):  # community exists, one page of users
+            first = self.client.get(url, {"limit": 3}).data
+        second = self.client.get(first["next"]).data
+        ids = [m["id"] for m in first["results"] + second["results"]]
+        self.assertEqual(sorted(ids), sorted(self.community.members.values_list("id", flat=True)))
+        self.assertEqual(set(first["results"][0]), {"id", "username"})
+
+
+# ======================================================
+# SERIES FULL-TEXT SEARCH
+# ======================================================
+class SeriesSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.kara_sevda = Series.objects.create(title="Kara Sevda", description="Kemal and Nihan")
+        cls.ask = Series.objects.create(title="Aşk-ı Memnu", description="A forbidden love")
+        cls.other = Series.objects.create(title="Diriliş", description="Kara tarihi")
+
+    def setUp(self):
+        catalog_cache().clear()
+        self.client = APIClient()
+
+    def titles(self, term):
+        response = self.client.get("/api/series/", {"search": term})
+        self.assertEqual(response.status_code, 200)
+        return [s["title"] for s in response.json()["results"]]
+
+    def test_prefix_match_ranks_title_hits_first(self):
+        self.assertEqual(self.titles("kar"), ["Kara Sevda", "Diriliş"])
+        self.assertEqual(self.titles("kara sev"), ["Kara Sevda"])
+
+    def test_diacritics_are_folded(self):
+        self.assertEqual(self.titles("ask"), ["Aşk-ı Memnu"])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.ask.title = "Yaprak Dökümü"
+        self.ask.save()
+        self.assertEqual(self.titles("ask"), [])
+        self.assertEqual(self.titles("yaprak"), ["Yaprak Dökümü"])
+        self.kara_sevda.delete()
+        self.assertEqual(self.titles("sevda"), [])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.titles('"kara*('), ["Kara Sevda", "Diriliş"])
+        self.assertEqual(self.titles("kara OR nihan"), [])
+
+
+# ======================================================
+# SERIES RESPONSE CACHE + CONDITIONAL GET
+# ======================================================
+class SeriesCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username="admin", password="pw", is_staff=True)
+        Series.objects.create(title="Kara Sevda", description="...")
+
+    def setUp(self):
+        catalog_cache().clear()
+        self.client = APIClient()
+
+    def test_repeat_reads_skip_the_database(self):
+        first = self.client.get("/api/series/")
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get("/api/series/")
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_conditional_get_returns_304(self):
+        first = self.client.get("/api/series/")
+        response = self.client.get("/api/series/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get("/api/series/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_bump_the_catalog_version(self):
+        first = self.client.get("/api/series/")
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/series/", {"title": "Diriliş", "description": "..."})
+        response = self.client.get("/api/series/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 2)
+
+    def test_version_moves_only_on_commit(self):
+        before = get_catalog_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Series.objects.create(title="Diriliş", description="...")
+            self.assertEqual(get_catalog_version(), before)
+        for callback in callbacks:
+            callback()
+        version, modified = get_catalog_version()
+        self.assertGreater(version, before[0])
+        self.assertGreater(modified, before[1])
+
+    def test_bump_reseeds_a_lost_version(self):
+        version_cache().clear()
+        bump_catalog_version()
+        version, _ = get_catalog_version()
+        bump_catalog_version()
+        self.assertEqual(get_catalog_version()[0], version + 1)
+
+    def test_version_is_shared_between_workers(self):
+        first = self.client.get("/api/series/")
+        # Another worker process records a catalog write.
+        worker = multiprocessing.get_context("fork").Process(target=bump_catalog_version)
+        worker.start()
+        worker.join(10)
+        self.assertEqual(worker.exitcode, 0)
+        response = self.client.get("/api/series/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+
+
+# ======================================================
+# HOT QUERY PLANS — index-backed, no scans or temp sorts
+# ======================================================
+class QueryPlanTests(TestCase):
+    """EXPLAIN QUERY PLAN for each hot access path must hit its composite index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="zeynep", password="pw")
+        cls.series = Series.objects.create(title="Kara Sevda", description="...", genre="drama")
+        cls.community = Community.objects.create(series=cls.series, language="tr", created_by=cls.user)
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor != "sqlite":
+            self.skipTest("query plans are asserted against SQLite")
+        plan = self.query_plan(queryset)
+        details = "\n".join(plan)
+        self.assertTrue(any(index_name in step for step in plan), details)
+        self.assertFalse(any("TEMP B-TREE" in step for step in plan), details)
+        self.assertFalse(
+            any(step.startswith("SCAN") and "INDEX" not in step for step in plan), details
+        )
+
+    def test_room_messages(self):
+        self.assertUsesIndex(
+            Message.objects.filter(community=self.community).order_by("-created_at", "-id")[:51],
+            "message_room_keyset_idx",
+        )
+
+    def test_room_posts(self):
+        self.assertUsesIndex(
+            Post.objects.filter(community=self.community).order_by("-created_at")[:20],
+            "post_room_recent_idx",
+        )
+        self.assertUsesIndex(Post.objects.order_by("-created_at")[:20], "post_recent_idx")
+
+    def test_user_notifications(self):
+        self.assertUsesIndex(
+            Notification.objects.filter(user=self.user).order_by("-created_at")[:20],
+            "notif_user_recent_idx",
+        )
+        self.assertUsesIndex(
+            Notification.objects.filter(user=self.user, is_read=False).order_by("-created_at")[:20],
+            "notif_user_unread_idx",
+        )
+
+    def test_watchlist_by_status(self):
+        self.assertUsesIndex(
+            Watchlist.objects.filter(user=self.user, status="watching"),
+            "watchlist_user_status_idx",
+        )
+
+    def test_series_catalog_filters(self):
+        self.assertUsesIndex(
+            Series.objects.filter(genre="drama").order_by("-id")[:20], "series_genre_idx"
+        )
+        self.assertUsesIndex(
+            Series.objects.filter(release_year=2015).order_by("-id")[:20], "series_year_idx"
+        )
+
+
+# ======================================================
+# CHAT WRITE-BEHIND BUFFER
+# ======================================================
+class MessageWriteBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="can", password="pw")
+        series = Series.objects.create(title="Kara Sevda", description="...")
+        cls.community = Community.objects.create(series=series, language="tr", created_by=cls.user)
+
+    async def test_flushes_on_size_and_drains(self):
+        buffer = MessageWriteBuffer(max_batch=2, max_delay=60)
+        await buffer.add(self.community.id, self.user.id, "bir")
+        self.assertEqual(buffer.stats()["depth"], 1)
+        await buffer.add(self.community.id, self.user.id, "iki")
+        await buffer.add(str(self.community.id), str(self.user.id), "üç")
+        await buffer.drain()
+
+        contents = [m.content async for m in Message.objects.order_by("id")]
+        self.assertEqual(contents, ["bir", "iki", "üç"])
+        stats = buffer.stats()
+        self.assertEqual((stats["depth"], stats["written"], stats["flushes"]), (0, 3, 2))
+
+    async def test_flushes_after_delay(self):
+        buffer = MessageWriteBuffer(max_batch=100, max_delay=0.01)
+        await buffer.add(self.community.id, self.user.id, "selam")
+        await asyncio.sleep(0.05)
+        await buffer.drain()
+        self.assertEqual(await Message.objects.acount(), 1)
+
+    async def test_invalid_rows_are_dropped(self):
+        buffer = MessageWriteBuffer(max_batch=100, max_delay=60)
+        await buffer.add(self.community.id, None, "anonymous")
+        await buffer.add(self.community.id, 9999, "ghost")
+        await buffer.add(self.community.id, self.user.id, "real")
+        await buffer.drain()
+        self.assertEqual(await Message.objects.acount(), 1)
+        self.assertEqual(buffer.stats()["dropped"], 2)
+
+    def test_drain_sync_writes_batches_of_unfinished_writes(self):
+        buffer = MessageWriteBuffer(max_batch=2, max_delay=60)
+
+        async def abandon():
+            # The batch waits behind an earlier write that never finishes.
+            buffer._last_write = asyncio.get_running_loop().create_future()
+            for text in ("1", "2", "3"):
+                await buffer.add(self.community.id, self.user.id, text)
+
+        asyncio.run(abandon())  # the loop closes before the write task runs
+        self.assertEqual(Message.objects.count(), 0)
+        buffer.drain_sync()
+        contents = list(Message.objects.order_by("id").values_list("content", flat=True))
+        self.assertEqual(contents, ["1", "2", "3"])
+        self.assertEqual(buffer.depth(), 0)
+
+    async def test_producers_wait_while_writes_are_stalled(self):
+        buffer = MessageWriteBuffer(max_batch=2, max_delay=60, max_pending=4)
+        release = threading.Event()
+        real_write = buffer._write
+
+        def stalled_write(batch):
+            release.wait(5)
+            return real_write(batch)
+
+        buffer._write = stalled_write
+        for text in ("1", "2", "3"):
+            await buffer.add(self.community.id, self.user.id, text)
+        self.assertEqual(buffer.stats()["in_flight"], 2)
+
+        # The 4th row reaches max_pending counting the stalled batch: wait.
+        producer = asyncio.ensure_future(buffer.add(self.community.id, self.user.id, "4"))
+        await asyncio.sleep(0.05)
+        self.assertFalse(producer.done())
+        self.assertEqual(buffer.depth(), 4)
+
+        release.set()
+        await asyncio.wait_for(producer, 5)
+        self.assertEqual(buffer.depth(), 0)
+        self.assertEqual(await Message.objects.acount(), 4)
+
+
+# ======================================================
+# CHAT SEQUENCES & RESUME REPLAY
+# ======================================================
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class ChatReplayTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="elif", password="pw")
+        series = Series.objects.create(title="Aşk-ı Memnu", description="...")
+        cls.community = Community.objects.create(series=series, language="tr", created_by=cls.user)
+
+    def store(self, count):
+        for _ in range(count):
+            Message.objects.create(
+                community=self.community, user=self.user, content="eski",
+                seq=next_message_seq(self.community.id),
+            )
+
+    async def connect(self, query=""):
+        application = URLRouter(websocket_urlpatterns)
+        communicator = WebsocketCommunicator(application, f"/ws/chat/{self.community.id}/{query}")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    def test_seq_is_monotonic_per_room(self):
+        self.assertEqual([next_message_seq(self.community.id) for _ in range(3)], [1, 2, 3])
+        self.assertEqual(next_message_seq(self.community.id, 5), 4)
+        self.assertIsNone(next_message_seq(9999))
+        self.community.refresh_from_db()
+        self.assertEqual(self.community.last_seq, 8)
+
+    def test_flush_numbers_each_room_with_one_reservation(self):
+        series = Series.objects.create(title="Ezel", description="...")
+        other = Community.objects.create(series=series, language="tr", created_by=self.user)
+        batch = [(room.id, self.user.id, "m", None) for room in (self.community, other) * 25]
+        # communities, users, SAVEPOINT, one seq UPDATE per room, INSERT, RELEASE, trending
+        with self.assertNumQueries(8):
+            seqs = MessageWriteBuffer()._write(batch)
+        self.assertEqual(seqs[:4], [1, 1, 2, 2])
+        self.assertEqual(seqs[-2:], [25, 25])
+
+    async def test_reconnect_replays_from_ring(self):
+        first = await self.connect()
+        for text in ("bir", "iki", "üç"):
+            await first.send_json_to({"message": text, "username": "elif", "user_id": self.user.id})
+            await first.receive_json_from()
+        reads = room_history.db_reads
+
+        second = await self.connect("?after_seq=1")
+        replayed = [await second.receive_json_from() for _ in range(2)]
+        self.assertEqual([(m["seq"], m["message"], m["replay"]) for m in replayed],
+                         [(2, "iki", True), (3, "üç", True)])
+        self.assertEqual(room_history.db_reads, reads)
+
+        await first.send_json_to({"message": "dört", "username": "elif", "user_id": self.user.id})
+        self.assertEqual((await second.receive_json_from())["seq"], 4)
+        await first.disconnect()
+        await second.disconnect()
+
+        await message_buffer.drain()
+        seqs = [m.seq async for m in Message.objects.order_by("seq")]
+        self.assertEqual(seqs, [1, 2, 3, 4])
+
+    async def test_fan_out_encodes_once(self):
+        listeners = [await self.connect() for _ in range(3)]
+        await listeners[0].send_json_to({"message": "selam", "username": "elif", "user_id": self.user.id})
+        with mock.patch("main.buffers.json.dumps", wraps=json.dumps) as dumps:
+            frames = [await listener.receive_from() for listener in listeners]
+        self.assertEqual(dumps.call_count, 1)
+        self.assertEqual(len(set(frames)), 1)
+        self.assertEqual(json.loads(frames[0])["message"], "selam")
+        for listener in listeners:
+            await listener.disconnect()
+        await message_buffer.drain()
+
+    async def test_batch_mode_coalesces_a_tick(self):
+        sender = await self.connect()
+        batched = await self.connect("?batch=1")
+        for text in ("a", "b", "c"):
+            await sender.send_json_to({"message": text, "username": "elif", "user_id": self.user.id})
+        for _ in range(3):
+            await sender.receive_json_from()
+        frame = await batched.receive_json_from()
+        self.assertEqual([m["message"] for m in frame["batch"]], ["a", "b", "c"])
+        self.assertTrue(await batched.receive_nothing())
+        await sender.disconnect()
+        await batched.disconnect()
+        await message_buffer.drain()
+
+    async def test_gap_outside_ring_reads_database_once(self):
+        await database_sync_to_async(self.store)(5)
+        history = RoomHistory(size=10, max_replay=10)
+        history.attach(self.community.id)
+        results = await asyncio.gather(*(history.replay(self.community.id, 2) for _ in range(3)))
+        for events, gap in results:
+            self.assertEqual([e["seq"] for e in events], [3, 4, 5])
+            self.assertIsNone(gap)
+        self.assertEqual((history.db_reads, history.coalesced_reads), (1, 2))
+
+        # The read seeded the ring: later resumes stay in memory.
+        events, _ = await history.replay(self.community.id, 4)
+        self.assertEqual([e["seq"] for e in events], [5])
+        self.assertEqual(history.db_reads, 1)
+
+        history.detach(self.community.id)
+        self.assertEqual(history.stats()["rooms"], 0)
+
+    async def test_large_gap_is_truncated(self):
+        await database_sync_to_async(self.store)(6)
+        history = RoomHistory(size=10, max_replay=3)
+        history.attach(self.community.id)
+        events, gap = await history.replay(self.community.id, 0)
+        self.assertEqual([e["seq"] for e in events], [4, 5, 6])
+        self.assertEqual(gap, 4)
+
+    async def test_missing_seqs_are_a_gap(self):
+        await database_sync_to_async(self.store)(5)
+        await Message.objects.filter(community=self.community, seq=2).adelete()
+        history = RoomHistory(size=10, max_replay=10)
+        history.attach(self.community.id)
+        events, gap = await history.replay(self.community.id, 0)
+        self.assertEqual([e["seq"] for e in events], [3, 4, 5])
+        self.assertEqual(gap, 3)
+
+        # Reserved but not readable yet: nothing past seq 5 is claimed.
+        await Community.objects.filter(pk=self.community.id).aupdate(last_seq=7)
+        history = RoomHistory(size=10, max_replay=10)
+        history.attach(self.community.id)
+        events, gap = await history.replay(self.community.id, 5)
+        self.assertEqual((events, gap), ([], 8))
+        self.assertEqual(history.rooms[self.community.id].complete_after, 7)
+
+    async def test_holes_in_the_ring_are_read_from_the_database(self):
+        await database_sync_to_async(self.store)(7)
+        events = {e["seq"]: e for e in (await database_sync_to_async(stored_chat_events)(self.community.id, 0))[0]}
+        history = RoomHistory(size=10, max_replay=10)
+        history.attach(self.community.id)
+        history.record(self.community.id, events[5])
+        history.record(self.community.id, events[7])  # 6 still in flight
+        replayed, gap = await history.replay(self.community.id, 5)
+        self.assertEqual(([e["seq"] for e in replayed], gap), ([6, 7], None))
+        self.assertEqual(history.db_reads, 1)
+
+    async def test_out_of_order_events_are_delivered(self):
+        await database_sync_to_async(self.store)(2)
+        listener = await self.connect("?after_seq=0")
+        self.assertEqual([(await listener.receive_json_from())["seq"] for _ in range(2)], [1, 2])
+        layer = get_channel_layer()
+        for seq in (4, 2, 3):  # 2 was replayed already
+            await layer.group_send(f"chat_{self.community.id}", chat_event(seq, "geç", "elif", "12:00"))
+        self.assertEqual([(await listener.receive_json_from())["seq"] for _ in range(2)], [4, 3])
+        self.assertTrue(await listener.receive_nothing())
+        await listener.disconnect()
+
+    def post_message(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return client.post(
+                "/api/messages/", {"community": self.community.id, "user": self.user.id, "content": "rest"}
+            )
+
+    async def test_rest_messages_reach_the_room(self):
+        listener = await self.connect()
+        response = await database_sync_to_async(self.post_message)()
+        self.assertEqual((response.status_code, response.json()["seq"]), (201, 1))
+        message = await listener.receive_json_from()
+        self.assertEqual((message["seq"], message["message"]), (1, "rest"))
+        self.assertEqual(room_history.rooms[self.community.id].seqs, [1])
+        await listener.disconnect()
+
+    async def test_unflushed_messages_are_not_replayed_as_complete(self):
+        with mock.patch.object(message_buffer, "max_delay", 60):
+            sender = await self.connect()
+            await sender.send_json_to({"message": "bekliyor", "username": "elif", "user_id": self.user.id})
+            await asyncio.sleep(0.05)
+            self.assertEqual(message_buffer.depth(), 1)
+
+            late = await self.connect("?after_seq=0")
+            self.assertTrue(await late.receive_nothing())
+            await message_buffer.flush()
+            message = await late.receive_json_from()
+            self.assertEqual((message["seq"], message["message"]), (1, "bekliyor"))
+            await sender.disconnect()
+            await late.disconnect()
+        await message_buffer.drain()
+
+
+# ======================================================
+# CHAT PRESENCE
+# ======================================================
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class PresenceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="selin", password="pw")
+        series = Series.objects.create(title="Yasak Elma", description="...")
+        cls.community = Community.objects.create(series=series, language="tr", created_by=cls.user)
+
+    async def connect(self):
+        application = URLRouter(websocket_urlpatterns)
+        communicator = WebsocketCommunicator(application, f"/ws/chat/{self.community.id}/")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    def online(self):
+        return APIClient().get(f"/api/communities/{self.community.id}/presence/").json()["online"]
+
+    async def test_counts_and_throttled_pushes(self):
+        with mock.patch.object(presence, "push_interval", 0.05):
+            first = await self.connect()
+            second = await self.connect()
+            self.assertEqual(await database_sync_to_async(self.online)(), 2)
+            # Both joins land in one push per worker.
+            self.assertEqual(await first.receive_json_from(), {"presence": {"online": 2}})
+
+            await second.disconnect()
+            self.assertEqual(await database_sync_to_async(self.online)(), 1)
+            self.assertEqual(await first.receive_json_from(), {"presence": {"online": 1, "change": -1}})
+            await first.disconnect()
+        self.assertEqual(await RoomPresence.objects.acount(), 0)
+
+    async def test_unknown_room_is_refused_before_accept(self):
+        application = URLRouter(websocket_urlpatterns)
+        communicator = WebsocketCommunicator(application, "/ws/chat/9999/")
+        connected, code = await communicator.connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4004)
+        self.assertEqual(await RoomPresence.objects.acount(), 0)
+        self.assertNotIn(9999, room_history.listeners)
+        await communicator.wait()
+
+    def test_dead_worker_sockets_expire(self):
+        now = timezone.now()
+        RoomPresence.objects.create(
+            channel_name="specific.dead!1", community=self.community, worker="dead",
+            last_seen=now - timedelta(minutes=5),
+        )
+        RoomPresence.objects.create(
+            channel_name="specific.live!1", community=self.community, worker="live",
+            last_seen=now - timedelta(minutes=5),
+        )
+        Community.objects.filter(pk=self.community.pk).update(online_count=2)
+
+        registry = PresenceRegistry(ttl=90)
+        registry.worker_id = "live"
+        self.assertEqual(registry.beat(now), {self.community.id: 1})
+        self.assertEqual(self.online(), 1)
+        self.assertEqual(list(RoomPresence.objects.values_list("worker", flat=True)), ["live"])
+
+
+# ======================================================
+# WEBSOCKET RATE LIMITS
+# ======================================================
+class WebSocketGuardTests(SimpleTestCase):
+    def test_token_bucket_refills_at_rate(self):
+        bucket = TokenBucket(rate=2, burst=2)
+        start = bucket.updated
+        self.assertEqual([bucket.take(start) for _ in range(3)], [True, True, False])
+        self.assertFalse(bucket.take(start + 0.25))
+        self.assertTrue(bucket.take(start + 0.5))
+        self.assertEqual(bucket.tokens, 0)
+        self.assertTrue(bucket.take(start + 100) and bucket.tokens == 1)  # capped at burst
+
+    def test_room_bucket_is_shared(self):
+        guard = WebSocketGuard(socket_rate=1, socket_burst=10, room_rate=1, room_burst=3)
+        first, second = guard.socket_bucket(), guard.socket_bucket()
+        allowed = [guard.allow(bucket, room=7) for bucket in (first, second, first, second)]
+        self.assertEqual(allowed, [True, True, True, False])
+        self.assertEqual(guard.stats()["throttled_room"], 1)
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class ChatRateLimitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="burak", password="pw")
+        series = Series.objects.create(title="Sen Çal Kapımı", description="...")
+        cls.community = Community.objects.create(series=series, language="tr", created_by=cls.user)
+
+    async def test_flood_is_throttled_before_the_database(self):
+        application = URLRouter(websocket_urlpatterns)
+        communicator = WebsocketCommunicator(application, f"/ws/chat/{self.community.id}/")
+        with mock.patch.multiple(socket_guard, socket_rate=0.001, socket_burst=2):
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            for text in ("bir", "iki", "üç"):
+                await communicator.send_json_to({"message": text, "user_id": self.user.id})
+            frames = [await communicator.receive_json_from() for _ in range(3)]
+        self.assertEqual(sorted(frame.get("message", frame.get("error")) for frame in frames),
+                         ["Rate limit exceeded", "bir", "iki"])
+        await communicator.disconnect()
+        await message_buffer.drain()
+        self.assertEqual(await Message.objects.acount(), 2)
+        community = await Community.objects.aget(pk=self.community.pk)
+        self.assertEqual(community.last_seq, 2)
+
+    async def connect(self, query=""):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f"/ws/chat/{self.community.id}/{query}"
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_persistent_flood_is_disconnected(self):
+        with mock.patch.multiple(socket_guard, socket_rate=0.001, socket_burst=1,
+                                 strike_rate=0.001, strike_burst=2, disconnected=Counter()):
+            communicator = await self.connect()
+            for text in ("bir", "iki", "üç", "dört"):
+                await communicator.send_json_to({"message": text, "user_id": self.user.id})
+            # "bir" is let through, two frames are warned, the fourth closes it.
+            for _ in range(2):
+                self.assertEqual(await communicator.receive_json_from(), {"error": "Rate limit exceeded"})
+            self.assertEqual((await communicator.receive_output())["code"], 4008)
+            self.assertEqual(socket_guard.stats()["disconnected_throttled"], 1)
+            await communicator.disconnect()
+        await message_buffer.drain()
+
+    async def flood(self, count):
+        layer = get_channel_layer()
+        for seq in range(count):
+            await layer.group_send(f"chat_{self.community.id}", chat_event(seq + 1, "x", "burak", "12:00"))
+
+    async def test_batch_outbox_drops_oldest_then_disconnects(self):
+        with mock.patch.multiple(socket_guard, outbox_max=2, overflow_ticks=2, dropped=0, disconnected=Counter()):
+            communicator = await self.connect("?batch=1")
+            await self.flood(5)
+            batch = (await communicator.receive_json_from())["batch"]
+            self.assertEqual([event["seq"] for event in batch], [4, 5])
+            self.assertEqual(socket_guard.stats()["outbox_dropped"], 3)
+
+            await self.flood(5)
+            await communicator.receive_json_from()
+            self.assertEqual((await communicator.receive_output())["code"], 4008)
+            self.assertEqual(socket_guard.stats()["disconnected_overflow"], 1)
+            await communicator.disconnect()
+        self.assertNotIn(self.community.id, room_history.rooms)
+
+
+# ======================================================
+# UNIX SOCKET CHANNEL LAYER — cross-process delivery
+# ======================================================
+class UnixSocketChannelLayerTests(SimpleTestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp(prefix="layer-", dir="/tmp")
+        self.addCleanup(shutil.rmtree, self.path, ignore_errors=True)
+
+    def make_layer(self, **config):
+        return UnixSocketChannelLayer(path=self.path, **config)
+
+    def test_messages_cross_worker_processes(self):
+        ready, child_end = multiprocessing.Pipe()
+        worker = multiprocessing.get_context("fork").Process(
+            target=run_layer_worker, args=(self.path, child_end)
+        )
+        worker.start()
+        self.addCleanup(worker.join, 5)
+        self.assertTrue(ready.poll(5), "worker process did not start")
+        channel = ready.recv()
+
+        layer = self.make_layer()
+        async_to_sync(layer.group_send)("chat_1", {"type": "chat.message", "message": "selam"})
+        async_to_sync(layer.send)(channel, {"type": "chat.message", "message": "direct"})
+
+        self.assertTrue(ready.poll(5), "worker process received nothing")
+        self.assertEqual(sorted(ready.recv()), ["direct", "selam"])
+
+    async def test_group_send_skips_workers_without_members(self):
+        alpha, beta = self.make_layer(), self.make_layer()
+        channel = await beta.new_channel()
+        await beta.group_add("chat_2", channel)
+        await alpha.new_channel()
+
+        self.assertEqual(alpha.group_workers("chat_2"), [beta.worker_id])
+        await alpha.group_send("chat_2", {"type": "chat.message", "n": 1})
+        message = await asyncio.wait_for(beta.receive(channel), 5)
+        self.assertEqual(message["n"], 1)
+
+        await beta.group_discard("chat_2", channel)
+        self.assertEqual(alpha.group_workers("chat_2"), [])
+        await alpha.close()
+        await beta.close()
+
+    async def test_remote_channel_capacity(self):
+        alpha, beta = self.make_layer(), self.make_layer(capacity=2)
+        await alpha.new_channel()
+        channel = await beta.new_channel()
+        for n in range(3):
+            await alpha.send(channel, {"type": "chat.message", "n": n})
+        await asyncio.wait_for(beta.receive(channel), 5)
+        while beta.received_remote < 3:
+            await asyncio.sleep(0.01)
+        self.assertEqual(beta.stats()["dropped"], 1)
+        await alpha.close()
+        await beta.close()
+
+    async def test_transient_errors_keep_peer_markers(self):
+        alpha, beta = self.make_layer(), self.make_layer()
+        await alpha.new_channel()
+        await beta.group_add("chat_4", await beta.new_channel())
+        with mock.patch.object(alpha, "_get_writer", side_effect=TimeoutError):
+            await alpha.group_send("chat_4", {"type": "chat.message"})
+        self.assertEqual(alpha.group_workers("chat_4"), [beta.worker_id])
+        self.assertEqual(alpha.stats()["failed_sends"], 1)
+
+        await beta.close()  # its socket is gone; leave a marker as a crash would
+        with open(os.path.join(alpha.group_dir("chat_4"), beta.worker_id), "a"):
+            pass
+        await alpha.group_send("chat_4", {"type": "chat.message"})
+        self.assertEqual(alpha.group_workers("chat_4"), [])
+        await alpha.close()
+
+    def test_refuses_a_shared_directory(self):
+        os.chmod(self.path, 0o777)
+        with self.assertRaises(ImproperlyConfigured):
+            self.make_layer()
+        os.chmod(self.path, 0o700)
+        self.make_layer()
+
+    async def test_full_local_channel_is_counted(self):
+        layer = self.make_layer(capacity=1)
+        slow, live = await layer.new_channel(), await layer.new_channel()
+        for channel in (slow, live):
+            await layer.group_add("chat_3", channel)
+        await layer.group_send("chat_3", {"type": "chat.message", "n": 0})
+        self.assertEqual((await layer.receive(live))["n"], 0)
+        await layer.group_send("chat_3", {"type": "chat.message", "n": 1})
+        self.assertEqual((await layer.receive(live))["n"], 1)
+        self.assertEqual((await layer.receive(slow))["n"], 0)
+        self.assertEqual(layer.stats()["dropped"], 1)
+        await layer.close()
+
+
+def run_layer_worker(path, conn):
+    """Body of the forked worker in test_messages_cross_worker_processes."""
+    async def main():
+        layer = UnixSocketChannelLayer(path=path)
+        channel = await layer.new_channel()
+        await layer.group_add("chat_1", channel)
+        conn.send(channel)
+        received = []
+        for _ in range(2):
+            message = await asyncio.wait_for(layer.receive(channel), 5)
+            received.append(message["message"])
+        conn.send(received)
+        await layer.close()
+
+    try:
+        asyncio.run(main())
+    finally:
+        os._exit(0)
+
+
+# ======================================================
+# PER-USER NOTIFICATION PUSH
+# ======================================================
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class NotificationPushTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="deniz", password="pw")
+        cls.token = Token.objects.create(user=cls.user)
+
+    async def connect(self, query=""):
+        application = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+        communicator = WebsocketCommunicator(application, f"/ws/notifications/{query}")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.receive_json_from()  # welcome message
+        return communicator
+
+    def create_notification(self, message):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(user=self.user, message=message)
+
+    async def test_new_rows_reach_only_their_owner(self):
+        owner = await self.connect(f"?token={self.token.key}")
+        anonymous = await self.connect()
+
+        notification = await database_sync_to_async(self.create_notification)("You joined!")
+        payload = await owner.receive_json_from()
+        self.assertEqual(payload["notification"]["id"], notification.id)
+        self.assertEqual(payload["message"], "You joined!")
+        self.assertTrue(await anonymous.receive_nothing())
+
+        await owner.disconnect()
+        await anonymous.disconnect()
+
+    async def test_broadcasts_reach_everyone(self):
+        owner = await self.connect(f"?token={self.token.key}")
+        anonymous = await self.connect()
+        await database_sync_to_async(broadcast_notification)("New Dizi added: Diriliş")
+        for communicator in (owner, anonymous):
+            payload = await communicator.receive_json_from()
+            self.assertEqual(payload, {"message": "New Dizi added: Diriliş"})
+            await communicator.disconnect()
+
+    async def test_client_frames_are_not_rebroadcast(self):
+        sender = await self.connect()
+        listener = await self.connect()
+        await sender.send_json_to({"message": "spam for everyone"})
+        self.assertTrue(await listener.receive_nothing())
+        self.assertTrue(await sender.receive_nothing())
+        await sender.disconnect()
+        await listener.disconnect()
+
+
+# ======================================================
+# LIBRARY SPARSE FIELDSETS
+# ======================================================
+class LibrarySparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="mert", password="pw")
+        cls.series = Series.objects.create(title="Kara Sevda", description="A very long synopsis")
+        Wishlist.objects.create(user=cls.user, series=cls.series)
+        Watchlist.objects.create(user=cls.user, series=cls.series, status="watching")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_full_representation_by_default(self):
+        item = self.client.get("/api/wishlist/").json()["results"][0]
+        self.assertEqual(item["series"]["description"], "A very long synopsis")
+        self.assertEqual(item["series_title"], "Kara Sevda")
+
+    def test_ids_plus_series_summary(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/wishlist/", {"fields": "id,series"})
+        item = response.json()["results"][0]
+        self.assertEqual(set(item), {"id", "series"})
+        self.assertEqual(set(item["series"]), {"id", "title", "image"})
+        select = ctx.captured_queries[-1]["sql"]
+        self.assertNotIn("description", select)
+        self.assertNotIn("auth_user", select)
+
+    def test_expand_series(self):
+        response = self.client.get("/api/watchlist/", {"fields": "id,status,series", "expand": "series"})
+        item = response.json()["results"][0]
+        self.assertEqual(set(item), {"id", "status", "series"})
+        self.assertEqual(item["series"]["description"], "A very long synopsis")
+        self.assertEqual(item["status"], "watching")
+
+    def test_unknown_fields_are_ignored(self):
+        response = self.client.get("/api/currently-watching/", {"fields": "id,bogus"})
+        self.assertEqual(response.status_code, 200)
+
+
+# ======================================================
+# LIBRARY BULK ADD / REMOVE
+# ======================================================
+class LibraryBulkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="ece", password="pw")
+        cls.series = Series.objects.bulk_create(
+            Series(title=f"Dizi {i}", description="...") for i in range(5)
+        )
+        reconcile_series_stats()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_add_reports_each_id(self):
+        ids = [s.id for s in self.series]
+        Watchlist.objects.create(user=self.user, series=self.series[0])
+        # present ids, existing series, insert, then one statement per hook:
+        # change queue, trending bucket, series stats
+        with self.assertNumQueries(6):
+            response = self.client.post(
+                "/api/watchlist/bulk/", {"series_ids": ids + [9999, "x"]}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(results[str(ids[0])], "already_present")
+        self.assertEqual(results[str(ids[1])], "added")
+        self.assertEqual(results["9999"], "not_found")
+        self.assertEqual(results["x"], "invalid")
+        self.assertEqual(response.json()["totals"]["added"], 4)
+        self.assertEqual(Watchlist.objects.filter(user=self.user).count(), 5)
+
+    def test_lost_inserts_are_not_counted(self):
+        ids = [s.id for s in self.series[:2]]
+        real_insert = insert_library_rows
+
+        def racing_insert(model, user_id, series_ids):
+            # Another request adds the first series between the read and the insert.
+            real_insert(model, user_id, ids[:1])
+            return real_insert(model, user_id, series_ids)
+
+        with mock.patch("main.counters.insert_library_rows", side_effect=racing_insert):
+            response = self.client.post("/api/wishlist/bulk/", {"series_ids": ids}, format="json")
+        self.assertEqual([response.json()["results"][str(i)] for i in ids], ["already_present", "added"])
+        counts = dict(SeriesStats.objects.filter(series_id__in=ids).values_list("series_id", "wishlist_count"))
+        self.assertEqual(counts, {ids[0]: 0, ids[1]: 1})
+        self.assertEqual(Wishlist.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_remove(self):
+        Wishlist.objects.bulk_create(Wishlist(user=self.user, series=s) for s in self.series[:2])
+        ids = [s.id for s in self.series[:3]]
+        # SAVEPOINT, rows, collector read, DELETE, change queue, one stats UPDATE, RELEASE
+        with self.assertNumQueries(7):
+            response = self.client.delete("/api/wishlist/bulk/", {"series_ids": ids}, format="json")
+        results = response.json()["results"]
+        self.assertEqual([results[str(i)] for i in ids], ["removed", "removed", "not_present"])
+        self.assertFalse(Wishlist.objects.filter(user=self.user).exists())
+        self.assertEqual(LibraryChange.objects.filter(user_id=self.user.id).count(), 2)
+
+    def test_bulk_remove_groups_stats_by_row(self):
+        Watchlist.objects.bulk_create([
+            Watchlist(user=self.user, series=self.series[0], status="finished", rating=5),
+            Watchlist(user=self.user, series=self.series[1], status="finished", rating=5),
+            Watchlist(user=self.user, series=self.series[2], status="watching"),
+        ])
+        reconcile_series_stats()
+        ids = [s.id for s in self.series]
+        with self.assertNumQueries(8):
+            self.client.delete("/api/watchlist/bulk/", {"series_ids": ids}, format="json")
+        self.assertEqual(SeriesStats.objects.filter(series_id__in=ids).aggregate(
+            ratings=Sum("rating_count"), finished=Sum("finished_count"), watching=Sum("watching_count"),
+        ), {"ratings": 0, "finished": 0, "watching": 0})
+
+    def test_rejects_oversized_requests(self):
+        response = self.client.post(
+            "/api/currently-watching/bulk/", {"series_ids": list(range(501))}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+# ======================================================
+# MY LIBRARY
+# ======================================================
+class MyLibraryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="selin", password="pw")
+        cls.series = Series.objects.bulk_create(
+            Series(title=f"Dizi {i}", description="...") for i in range(6)
+        )
+        Wishlist.objects.bulk_create(Wishlist(user=cls.user, series=s) for s in cls.series[:3])
+        Watchlist.objects.bulk_create(Watchlist(user=cls.user, series=s) for s in cls.series[2:5])
+        CurrentlyWatching.objects.create(user=cls.user, series=cls.series[2])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_one_request_fixed_queries(self):
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/library/")
+        data = response.json()
+        self.assertEqual(len(data["wishlist"]["results"]), 3)
+        self.assertEqual(len(data["watchlist"]["results"]), 3)
+        self.assertEqual(len(data["currently_watching"]["results"]), 1)
+        # Dizi 2 is in all three lists but emitted once
+        self.assertEqual(len(data["series"]), 5)
+        shared = str(self.series[2].id)
+        self.assertEqual(data["series"][shared]["title"], "Dizi 2")
+        self.assertEqual(data["currently_watching"]["results"][0]["series"], self.series[2].id)
+
+    def test_sections_page_independently(self):
+        first = self.client.get("/api/library/", {"limit": 2}).json()
+        self.assertEqual(first["wishlist"]["next_offset"], 2)
+        self.assertIsNone(first["currently_watching"]["next_offset"])
+        second = self.client.get("/api/library/", {"limit": 2, "wishlist_offset": 2}).json()
+        self.assertEqual(len(second["wishlist"]["results"]), 1)
+        self.assertIsNone(second["wishlist"]["next_offset"])
+        self.assertEqual(len(second["watchlist"]["results"]), 2)
+
+    def test_requires_authentication(self):
+        self.assertEqual(APIClient().get("/api/library/").status_code, 401)
+
+
+# ======================================================
+# TOKEN AUTHENTICATION CACHE
+# ======================================================
+class TokenCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="kerem", password="pw")
+
+    def setUp(self):
+        token_cache.clear()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_repeat_requests_skip_the_token_query(self):
+        self.client.get("/api/library/")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/library/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any("authtoken_token" in q["sql"] for q in ctx.captured_queries))
+        self.assertGreaterEqual(token_cache.stats()["hits"], 1)
+
+    def test_logout_invalidates(self):
+        self.client.get("/api/library/")
+        self.client.post("/api/logout/")
+        self.assertEqual(self.client.get("/api/library/").status_code, 401)
+
+    def test_deactivation_invalidates(self):
+        self.client.get("/api/library/")
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get("/api/library/").status_code, 401)
+
+    def test_lru_and_ttl_bounds(self):
+        cache = TokenUserCache(max_size=2, ttl=60)
+        tokens = [Token(key=f"k{i}", user=self.user) for i in range(3)]
+        for token in tokens:
+            cache.set(token.key, token)
+        self.assertIsNone(cache.get("k0"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+        expired = TokenUserCache(ttl=0)
+        expired.set("k1", tokens[1])
+        self.assertIsNone(expired.get("k1"))
+
+
+# ======================================================
+# UNREAD NOTIFICATION COUNTERS
+# ======================================================
+class UnreadCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="ada", password="pw")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def unread(self):
+        return self.client.get("/api/notifications/unread-count/").json()["unread"]
+
+    def test_counter_follows_creates_reads_and_deletes(self):
+        first = Notification.objects.create(user=self.user, message="one")
+        self.assertEqual(self.unread(), 1)
+        Notification.objects.create(user=self.user, message="two")
+        Notification.objects.create(user=self.user, message="three", is_read=True)
+        self.assertEqual(self.unread(), 2)
+
+        first.is_read = True
+        first.save()
+        self.assertEqual(self.unread(), 1)
+        Notification.objects.filter(is_read=False).get().delete()
+        self.assertEqual(self.unread(), 0)
+
+    def test_badge_read_is_constant_time(self):
+        Notification.objects.bulk_create(
+            Notification(user=self.user, message=str(i)) for i in range(50)
+        )
+        self.assertEqual(self.unread(), 50)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.unread(), 50)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn("COUNT(", ctx.captured_queries[0]["sql"].upper())
+
+    def test_mark_read_by_ids_and_all(self):
+        rows = [Notification.objects.create(user=self.user, message=str(i)) for i in range(4)]
+        self.unread()
+        ids = f"{rows[0].id},{rows[1].id}"
+        response = self.client.post(f"/api/notifications/mark-read/?ids={ids}")
+        self.assertEqual(response.json(), {"marked": 2, "unread": 2})
+
+        response = self.client.post("/api/notifications/mark-all-read/")
+        self.assertEqual(response.json(), {"marked": 2, "unread": 0})
+        self.assertFalse(Notification.objects.filter(is_read=False).exists())
+
+    def test_mark_read_rejects_bad_ids(self):
+        response = self.client.post("/api/notifications/mark-read/?ids=1,x")
+        self.assertEqual(response.status_code, 400)
+
+
+# ======================================================
+# COMMUNITY MEMBER COUNTS
+# ======================================================
+class MemberCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="deniz", password="pw")
+        series = Series.objects.create(title="Yargı", description="...")
+        cls.community = Community.objects.create(series=series, language="tr", created_by=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def member_count(self):
+        return Community.objects.values_list("member_count", flat=True).get(id=self.community.id)
+
+    def test_join_and_leave_keep_count_in_step(self):
+        url = f"/api/communities/{self.community.id}"
+        self.assertEqual(self.client.post(f"{url}/join/").json()["message"], "Joined successfully")
+        self.assertEqual(self.client.post(f"{url}/join/").json()["message"], "Already a member")
+        self.assertEqual(self.member_count(), 1)
+        self.assertEqual(self.client.get(f"{url}/").json()["member_count"], 1)
+
+        self.assertEqual(self.client.post(f"{url}/leave/").json()["message"], "Left successfully")
+        self.assertEqual(self.client.post(f"{url}/leave/").status_code, 400)
+        self.assertEqual(self.member_count(), 0)
+        self.assertFalse(self.community.members.exists())
+
+    def test_join_does_not_scale_with_membership(self):
+        others = User.objects.bulk_create(User(username=f"fan{i}") for i in range(30))
+        self.community.members.add(*others)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(f"/api/communities/{self.community.id}/join/")
+        self.assertEqual(response.status_code, 200)
+        statements = [
+            q["sql"] for q in ctx.captured_queries
+            if not q["sql"].startswith(("SAVEPOINT", "RELEASE", "BEGIN", "COMMIT"))
+        ]
+        # community lookup, insert, counter bump, notification (+ unread counter)
+        self.assertEqual(len(statements), 5)
+        for sql in statements:
+            self.assertNotIn("COUNT(", sql.upper())
+
+    def test_reconcile_command_repairs_drift(self):
+        self.community.members.add(self.user)  # bypasses the counter
+        out = io.StringIO()
+        call_command("reconcile_member_counts", "--dry-run", stdout=out)
+        self.assertIn("1 community member count(s) would be fixed", out.getvalue())
+        self.assertEqual(self.member_count(), 0)
+
+        call_command("reconcile_member_counts", stdout=io.StringIO())
+        self.assertEqual(self.member_count(), 1)
+        self.assertEqual(reconcile_member_counts(), 0)
+
+
+# ======================================================
+# SERIES IMAGE VARIANTS
+# ======================================================
+def poster(name="poster.png", size=(800, 1200)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "teal").save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+        self.enterContext(mock.patch.object(thumbnail_pipeline, "workers", 0))
+        catalog_cache().clear()
+
+    def create_series(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Series.objects.create(title="Kuruluş", description="...", image=poster(**kwargs))
+
+    def test_upload_renders_variants_and_srcset(self):
+        series = self.create_series()
+        response = self.client.get(f"/api/series/{series.id}/").json()
+        self.assertEqual(set(response["srcset"]), {"webp", "jpeg"})
+        entries = response["srcset"]["webp"].split(", ")
+        self.assertEqual([e.rsplit(" ", 1)[1] for e in entries], ["160w", "320w", "640w"])
+        self.assertTrue(entries[0].startswith("http://testserver/media/series_images/variants/"))
+
+        name = entries[0].split(" ")[0].split("/media/", 1)[1]
+        with Image.open(os.path.join(self.media_root, name)) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (160, 240)))
+
+    def test_replaced_image_hides_stale_variants(self):
+        series = self.create_series()
+        Series.objects.filter(pk=series.pk).update(image="series_images/other.png")
+        response = self.client.get(f"/api/series/{series.id}/").json()
+        self.assertEqual(response["srcset"], {})
+
+    def test_saves_without_the_image_do_not_rerender(self):
+        series = self.create_series()
+        series = Series.objects.only("id", "title").get(pk=series.pk)
+        series.title = "Kuruluş: Osman"
+        with mock.patch.object(thumbnail_pipeline, "submit") as submit:
+            with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(1):
+                series.save(update_fields=["title"])
+        submit.assert_not_called()
+
+    def test_community_tile_uses_smallest_variant(self):
+        user = User.objects.create_user(username="can", password="pw")
+        series = self.create_series(size=(120, 180))
+        community = Community.objects.create(series=series, language="tr", created_by=user)
+        tile = self.client.get(f"/api/communities/{community.id}/").json()["series_thumbnail"]
+        self.assertTrue(tile.endswith("-120.webp"), tile)
+
+    def test_backfill_command(self):
+        series = self.create_series()
+        Series.objects.filter(pk=series.pk).update(image_variants={})
+        out = io.StringIO()
+        call_command("generate_thumbnails", "--workers", "1", stdout=out)
+        self.assertIn("1 series rendered, 0 failed", out.getvalue())
+        series.refresh_from_db()
+        self.assertEqual(sorted(current_variants(series)["jpeg"], key=int), ["160", "320", "640"])
+
+
+# ======================================================
+# BULK CATALOG IMPORT
+# ======================================================
+@mock.patch("main.management.commands.import_series.broadcast_notification")
+class ImportSeriesTests(TestCase):
+    def feed(self, suffix, content):
+        handle = tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False, encoding="utf-8")
+        self.addCleanup(os.unlink, handle.name)
+        with handle:
+            handle.write(content)
+        return handle.name
+
+    def run_import(self, path, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_series", path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_dedupes_and_sends_one_digest(self, broadcast):
+        Series.objects.create(title="Ezel", description="...", release_year=2009)
+        path = self.feed(".csv", (
+            "title,description,genre,release_year\n"
+            "Ezel,revenge,Drama,2009\n"          # already in the catalog
+            "Kurtlar Vadisi,action,,2003\n"
+            "Kurtlar Vadisi,action,,2003\n"     # repeated in the feed
+            "Kurtlar Vadisi,remake,,2024\n"     # same title, other year
+            ",no title,,2010\n"
+            "Behzat Ç.,crime,Crime,not-a-year\n"
+            "Leyla ile Mecnun,comedy,Comedy,2011\n"
+        ))
+        out, err = self.run_import(path, "--batch-size", "2")
+
+        self.assertIn("7 read, 3 created, 2 duplicates, 2 invalid", out)
+        self.assertIn("Row 5:", err)
+        self.assertIn("Row 6:", err)
+        self.assertEqual(
+            sorted(Series.objects.values_list("title", "release_year")),
+            [("Ezel", 2009), ("Kurtlar Vadisi", 2003), ("Kurtlar Vadisi", 2024),
+             ("Leyla ile Mecnun", 2011)],
+        )
+        broadcast.assert_called_once_with("3 new Dizi added to the catalog")
+
+        broadcast.reset_mock()
+        out, _ = self.run_import(path)
+        self.assertIn("0 series imported", out)
+        broadcast.assert_not_called()
+
+    def test_jsonl_import_is_searchable(self, broadcast):
+        path = self.feed(".jsonl", (
+            '{"title": "Muhteşem Yüzyıl", "description": "Süleyman", "release_year": 2011}\n'
+            "\n"
+            "not json\n"
+        ))
+        out, err = self.run_import(path)
+        self.assertIn("1 series imported", out)
+        self.assertIn("line 3", err)
+        response = APIClient().get("/api/series/", {"search": "muhtesem"})
+        self.assertEqual([s["title"] for s in response.json()["results"]], ["Muhteşem Yüzyıl"])
+
+    def test_dry_run_writes_nothing(self, broadcast):
+        path = self.feed(".csv", "title,description\nGece Sesleri,...\n")
+        out, _ = self.run_import(path, "--dry-run")
+        self.assertIn("1 series would be imported", out)
+        self.assertFalse(Series.objects.exists())
+        broadcast.assert_not_called()
+
+    def test_dry_run_matches_a_real_run_across_batches(self, broadcast):
+        path = self.feed(".csv", (
+            "title,description,release_year\n"
+            "Kurtlar Vadisi,action,2003\n"
+            "Ezel,revenge,2009\n"
+            "Kurtlar Vadisi,action,2003\n"   # repeats a key from the first batch
+        ))
+        dry, _ = self.run_import(path, "--batch-size", "2", "--dry-run")
+        real, _ = self.run_import(path, "--batch-size", "2")
+        self.assertIn("3 read, 2 created, 1 duplicates, 0 invalid", dry)
+        self.assertIn("3 read, 2 created, 1 duplicates, 0 invalid", real)
+
+
+# ======================================================
+# NDJSON EXPORTS
+# ======================================================
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username="mod", password="pw", is_staff=True)
+        cls.user = User.objects.create_user(username="zeynep", password="pw")
+        series = Series.objects.create(title="Bir Zamanlar Çukurova", description="...")
+        cls.community = Community.objects.create(series=series, language="tr", created_by=cls.admin)
+        Message.objects.bulk_create(
+            Message(community=cls.community, user=cls.user, content=f"mesaj {i}") for i in range(5)
+        )
+        Message.objects.filter(content="mesaj 0").update(created_at="2020-01-01T00:00:00Z")
+        Wishlist.objects.create(user=cls.user, series=series)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def read_ndjson(self, response):
+        body = b"".join(response.streaming_content)
+        if response["Content-Type"] == "application/gzip":
+            body = gzip.decompress(body)
+        return [json.loads(line) for line in body.decode().splitlines()]
+
+    def test_community_export_streams_in_order(self):
+        self.client.force_authenticate(self.admin)
+        url = f"/api/communities/{self.community.id}/export/"
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = self.read_ndjson(response)
+        self.assertEqual([r["content"] for r in rows], [f"mesaj {i}" for i in range(5)])
+        self.assertEqual(rows[1]["user__username"], "zeynep")
+
+        response = self.client.get(url, {"since": "2021-01-01", "compress": "gzip"})
+        self.assertIn(".ndjson.gz", response["Content-Disposition"])
+        self.assertEqual(len(self.read_ndjson(response)), 4)
+        self.assertEqual(self.client.get(url, {"since": "yesterday"}).status_code, 400)
+
+    def test_community_export_is_staff_only(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(f"/api/communities/{self.community.id}/export/")
+        self.assertEqual(response.status_code, 403)
+
+    def test_export_uses_room_index(self):
+        plan = message_queryset(self.community.id, parse_time_range("2021-01-01")).explain()
+        self.assertIn("message_room_keyset_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_my_data_export(self):
+        self.client.force_authenticate(self.user)
+        rows = self.read_ndjson(self.client.get("/api/me/export/"))
+        self.assertEqual(rows[0]["type"], "profile")
+        kinds = [r["type"] for r in rows]
+        self.assertEqual(kinds.count("message"), 5)
+        self.assertEqual(kinds.count("wishlist"), 1)
+
+    def test_export_command_writes_gzip_file(self):
+        path = os.path.join(tempfile.mkdtemp(), "out.ndjson.gz")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        call_command("export_data", "--user", "zeynep", "--gzip", "-o", path)
+        with gzip.open(path, "rt") as handle:
+            rows = [json.loads(line) for line in handle]
+        self.assertEqual(rows[0]["username"], "zeynep")
+        with self.assertRaises(CommandError):
+            call_command("export_data", "--community", "999")
+
+
+# ======================================================
+# RECOMMENDATIONS
+# ======================================================
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.series = {
+            title: Series.objects.create(title=title, description="...")
+            for title in ["Ezel", "Kurtlar Vadisi", "Behzat Ç.", "Avrupa Yakası", "Leyla ile Mecnun"]
+        }
+        s = cls.series
+        cls.users = User.objects.bulk_create(User(username=f"fan{i}") for i in range(4))
+        u = cls.users
+        # Crime fans: Ezel + Kurtlar Vadisi go together, Behzat Ç. sometimes.
+        Watchlist.objects.bulk_create([
+            Watchlist(user=u[0], series=s["Ezel"]),
+            Watchlist(user=u[1], series=s["Ezel"]),
+            Watchlist(user=u[2], series=s["Avrupa Yakası"]),
+        ])
+        Wishlist.objects.bulk_create([
+            Wishlist(user=u[0], series=s["Kurtlar Vadisi"]),
+            Wishlist(user=u[1], series=s["Kurtlar Vadisi"]),
+            Wishlist(user=u[1], series=s["Behzat Ç."]),
+            Wishlist(user=u[2], series=s["Leyla ile Mecnun"]),
+            Wishlist(user=u[3], series=s["Ezel"]),
+        ])
+        CurrentlyWatching.objects.create(user=u[0], series=s["Ezel"])  # counts once
+
+    def setUp(self):
+        catalog_cache().clear()
+        self.client = APIClient()
+        call_command("refresh_recommendations", "--full", stdout=io.StringIO())
+
+    def similar_titles(self, title):
+        response = self.client.get(f"/api/series/{self.series[title].id}/similar/")
+        return [(row["title"], row["score"]) for row in response.json()["results"]]
+
+    def test_similar_ranked_by_cosine(self):
+        self.assertEqual(
+            self.similar_titles("Ezel"),
+            [("Kurtlar Vadisi", round(2 / 6 ** 0.5, 4)), ("Behzat Ç.", round(1 / 3 ** 0.5, 4))],
+        )
+        self.assertEqual([t for t, _ in self.similar_titles("Avrupa Yakası")], ["Leyla ile Mecnun"])
+
+    def test_similar_chunks_match_one_pass(self):
+        library = LibraryMatrix.load()
+        series_idx = np.arange(len(library.series_ids))
+        flatten = lambda rows: [(i, list(n), list(np.round(sc, 6))) for i, n, sc in rows]
+        self.assertEqual(
+            flatten(library.similar(series_idx, 3, chunk_size=2)),
+            flatten(library.similar(series_idx, 3, chunk_size=len(series_idx))),
+        )
+
+    def test_similar_is_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f"/api/series/{self.series['Ezel'].id}/similar/", {"limit": 1})
+        self.assertEqual(len(response.json()["results"]), 1)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        plan = SimilarSeries.objects.filter(series=self.series["Ezel"]).order_by("rank").explain()
+        self.assertIn("USING INDEX", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_user_recommendations_exclude_library(self):
+        self.client.force_authenticate(self.users[3])
+        titles = [r["title"] for r in self.client.get("/api/me/recommendations/").json()["results"]]
+        self.assertEqual(titles, ["Kurtlar Vadisi", "Behzat Ç."])
+
+    def test_incremental_refresh_follows_library_writes(self):
+        self.assertFalse(LibraryChange.objects.exists())
+        self.client.force_authenticate(self.users[2])
+        self.client.post("/api/wishlist/bulk/", {"series_ids": [self.series["Ezel"].id]}, format="json")
+        self.assertEqual(LibraryChange.objects.count(), 1)
+
+        out = io.StringIO()
+        call_command("refresh_recommendations", stdout=out)
+        self.assertFalse(LibraryChange.objects.exists())
+        self.assertIn("Avrupa Yakası", [t for t, _ in self.similar_titles("Ezel")])
+        self.assertIn("Ezel", [t for t, _ in self.similar_titles("Leyla ile Mecnun")])
+
+        # Matches what a full rebuild produces.
+        incremental = sorted(SimilarSeries.objects.values_list("series", "similar", "rank"))
+        call_command("refresh_recommendations", "--full", stdout=io.StringIO())
+        self.assertEqual(incremental, sorted(SimilarSeries.objects.values_list("series", "similar", "rank")))
+
+        Wishlist.objects.filter(user=self.users[2]).delete()
+        call_command("refresh_recommendations", stdout=io.StringIO())
+        self.assertNotIn("Avrupa Yakası", [t for t, _ in self.similar_titles("Ezel")])
+
+
+# ======================================================
+# TRENDING
+# ======================================================
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="ece", password="pw")
+        cls.old, cls.new, cls.chatty = [
+            Series.objects.create(title=title, description="...")
+            for title in ["Gümüş", "Sen Çal Kapımı", "Masumlar Apartmanı"]
+        ]
+        cls.community = Community.objects.create(series=cls.chatty, language="tr", created_by=cls.user)
+
+    def setUp(self):
+        catalog_cache().clear()
+        self.client = APIClient()
+
+    def activity(self, series):
+        return SeriesActivity.objects.filter(series=series).aggregate(
+            adds=Sum("library_adds"), messages=Sum("messages")
+        )
+
+    def titles(self, window):
+        response = self.client.get("/api/series/trending/", {"window": window})
+        return [row["title"] for row in response.json()["results"]]
+
+    def test_library_and_chat_writes_feed_buckets(self):
+        Wishlist.objects.create(user=self.user, series=self.new)
+        self.client.force_authenticate(self.user)
+        self.client.post("/api/watchlist/bulk/", {"series_ids": [self.new.id]}, format="json")
+        Watchlist.objects.filter(user=self.user).delete()  # removals don't count down
+        self.assertEqual(self.activity(self.new), {"adds": 2, "messages": 0})
+
+        MessageWriteBuffer()._write([(self.community.id, self.user.id, f"m{i}", None) for i in range(3)])
+        self.assertEqual(self.activity(self.chatty), {"adds": 0, "messages": 3})
+        self.assertEqual(SeriesActivity.objects.count(), 2)  # one bucket row per series
+
+    def test_rollup_ranks_each_window(self):
+        now = timezone.now()
+        record_activity(library_adds={self.old.id: 10}, now=now - timedelta(days=2))
+        record_activity(library_adds={self.new.id: 1}, messages={self.chatty.id: 3}, now=now)
+        record_activity(library_adds={self.new.id: 1}, now=now - timedelta(hours=3))
+        record_activity(messages={self.old.id: 99}, now=now - timedelta(days=8))
+
+        call_command("rollup_trending", stdout=io.StringIO())
+        self.assertEqual(self.titles("1h"), ["Sen Çal Kapımı", "Masumlar Apartmanı"])
+        self.assertEqual(self.titles("24h"), ["Sen Çal Kapımı", "Masumlar Apartmanı"])
+        self.assertEqual(self.titles("7d"), ["Gümüş", "Sen Çal Kapımı", "Masumlar Apartmanı"])
+        self.assertFalse(SeriesActivity.objects.filter(bucket__lt=now - timedelta(days=7)).exists())
+
+    def test_endpoint_reads_precomputed_rows(self):
+        record_activity(library_adds={self.new.id: 1})
+        rollup_trending()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/series/trending/")
+        self.assertEqual(response.json()["results"][0]["score"], 5)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(self.client.get("/api/series/trending/", {"window": "2d"}).status_code, 400)
+
+
+# ======================================================
+# SERIES STATS
+# ======================================================
+class SeriesStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(username=f"fan{i}", password="pw") for i in range(3)]
+        cls.top, cls.mid, cls.unrated = [
+            Series.objects.create(title=title, description="...")
+            for title in ["Şahsiyet", "Fatmagül", "Medcezir"]
+        ]
+
+    def setUp(self):
+        catalog_cache().clear()
+        self.client = APIClient()
+
+    def stats(self, series):
+        return self.client.get(f"/api/series/{series.id}/").json()["stats"]
+
+    def test_stats_follow_library_writes(self):
+        a = Watchlist.objects.create(user=self.users[0], series=self.top, status="watching", rating=5)
+        Watchlist.objects.create(user=self.users[1], series=self.top, rating=4)
+        Wishlist.objects.create(user=self.users[2], series=self.top)
+        stats = self.stats(self.top)
+        self.assertEqual(stats["avg_rating"], 4.5)
+        self.assertEqual(stats["rating_histogram"], {"1": 0, "2": 0, "3": 0, "4": 1, "5": 1})
+        self.assertEqual(stats["watchers"], {"watching": 1, "planned": 1, "finished": 0, "total": 2})
+        self.assertEqual(stats["wishlist_count"], 1)
+
+        a.status, a.rating = "finished", 2
+        a.save()
+        catalog_cache().clear()
+        stats = self.stats(self.top)
+        self.assertEqual((stats["avg_rating"], stats["watchers"]["finished"]), (3.0, 1))
+
+        Watchlist.objects.filter(series=self.top).delete()
+        Wishlist.objects.all().delete()
+        catalog_cache().clear()
+        stats = self.stats(self.top)
+        self.assertEqual((stats["avg_rating"], stats["rating_count"], stats["wishlist_count"]), (0, 0, 0))
+        self.assertEqual(reconcile_series_stats(), 0)
+
+    def test_library_writes_invalidate_cached_stats(self):
+        first = self.client.get(f"/api/series/{self.top.id}/")
+        self.client.force_authenticate(self.users[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/wishlist/bulk/", {"series_ids": [self.top.id]}, format="json")
+        response = self.client.get(f"/api/series/{self.top.id}/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+        self.assertEqual(response.json()["stats"]["wishlist_count"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Wishlist.objects.filter(series=self.top).delete()
+        self.assertEqual(self.stats(self.top)["wishlist_count"], 0)
+
+    def test_rating_out_of_range_is_rejected(self):
+        self.client.force_authenticate(self.users[0])
+        item = Watchlist.objects.create(user=self.users[0], series=self.top)
+        response = self.client.patch(f"/api/watchlist/{item.id}/", {"rating": 9})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(f"/api/watchlist/{item.id}/", {"rating": 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(SeriesStats.objects.get(series=self.top).rating_4, 1)
+
+    def test_catalog_sorts_by_stats_index(self):
+        Watchlist.objects.create(user=self.users[0], series=self.top, rating=5)
+        Watchlist.objects.create(user=self.users[0], series=self.mid, rating=3)
+        Wishlist.objects.create(user=self.users[0], series=self.mid)
+        titles = lambda ordering: [
+            s["title"] for s in self.client.get("/api/series/", {"ordering": ordering}).json()["results"]
+        ]
+        self.assertEqual(titles("-avg_rating"), ["Şahsiyet", "Fatmagül", "Medcezir"])
+        self.assertEqual(titles("-wishlist_count"), ["Fatmagül", "Medcezir", "Şahsiyet"])
+        plan = Series.objects.filter(stats__isnull=False).order_by("-stats__avg_rating", "-stats__series").explain()
+        self.assertIn("series_stats_rating_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_reconcile_command_seeds_missing_rows(self):
+        series = Series.objects.bulk_create([Series(title="Ramo", description="...")])[0]
+        Wishlist.objects.create(user=self.users[0], series=series)  # seeds lazily
+        self.assertEqual(SeriesStats.objects.get(series=series).wishlist_count, 1)
+
+        SeriesStats.objects.filter(series=series).update(wishlist_count=7)
+        out = io.StringIO()
+        call_command("reconcile_series_stats", stdout=out)
+        self.assertIn("1 series stats row(s) fixed", out.getvalue())
+        self.assertEqual(SeriesStats.objects.get(series=series).wishlist_count, 1)
+
+    def test_reconcile_works_in_chunks(self):
+        Wishlist.objects.bulk_create(Wishlist(user=self.users[0], series=s) for s in Series.objects.all())
+        SeriesStats.objects.filter(series=self.top).delete()
+        self.assertEqual(reconcile_series_stats(dry_run=True, chunk_size=2), Series.objects.count())
+        self.assertEqual(reconcile_series_stats(chunk_size=2), Series.objects.count())
+        self.assertEqual(reconcile_series_stats(), 0)
+        self.assertEqual(SeriesStats.objects.filter(wishlist_count=1).count(), Series.objects.count())
@@ -0,0 +1,114 @@
+import time
+from collections import Counter
+
+from django.conf import settings
+
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``burst``."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self, now=None):
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now=None):
+        self.refill(now)
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+# ======================================================
+# WEBSOCKET GUARD
+# ======================================================
+class WebSocketGuard:
+    """
+    Per-process rate limits and outbox policy for sockets.
+
+    Every chat socket gets its own bucket, and every room one more, shared
+    by the sockets of that room on this worker, so the room limit scales
+    with the number of workers. Each throttled frame also costs the socket
+    a strike (``strike_rate``/``strike_burst``); a socket out of strikes is
+    closed instead of being answered. Batched sockets queue at most
+    ``outbox_max`` frames and are closed after ``overflow_ticks``
+    overflowing ticks in a row (see consumers.OutboxMixin).
+    """
+
+    def __init__(self, socket_rate=5, socket_burst=10, room_rate=50, room_burst=100,
+                 strike_rate=1, strike_burst=10, outbox_max=256, overflow_ticks=20):
+        self.socket_rate = socket_rate
+        self.socket_burst = socket_burst
+        self.room_rate = room_rate
+        self.room_burst = room_burst
+        self.strike_rate = strike_rate
+        self.strike_burst = strike_burst
+        self.outbox_max = outbox_max
+        self.overflow_ticks = overflow_ticks
+        self.rooms = {}
+        self.throttled = Counter()
+        self.dropped = 0
+        self.disconnected = Counter()
+
+    def socket_bucket(self):
+        return TokenBucket(self.socket_rate, self.socket_burst)
+
+    def strike_bucket(self):
+        return TokenBucket(self.strike_rate, self.strike_burst)
+
+    def allow(self, bucket, room=None):
+        """Take a token from the socket's bucket, then from the room's."""
+        if not bucket.take():
+            self.throttled["socket"] += 1
+            return False
+        if room is None:
+            return True
+        room_bucket = self.rooms.get(room)
+        if room_bucket is None:
+            self._prune_rooms()
+            room_bucket = self.rooms[room] = TokenBucket(self.room_rate, self.room_burst)
+        if not room_bucket.take():
+            self.throttled["room"] += 1
+            return False
+        return True
+
+    def _prune_rooms(self):
+        # A refilled bucket is the same as a fresh one: forget idle rooms.
+        if len(self.rooms) < 10000:
+            return
+        now = time.monotonic()
+        for room, bucket in list(self.rooms.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.burst:
+                del self.rooms[room]
+
+    def stats(self):
+        return {
+            "throttled_socket": self.throttled["socket"],
+            "throttled_room": self.throttled["room"],
+            "outbox_dropped": self.dropped,
+            "disconnected_throttled": self.disconnected["throttled"],
+            "disconnected_overflow": self.disconnected["overflow"],
+            "room_buckets": len(self.rooms),
+        }
+
+
+socket_guard = WebSocketGuard(
+    socket_rate=getattr(settings, "CHAT_SOCKET_RATE", 5),
+    socket_burst=getattr(settings, "CHAT_SOCKET_BURST", 10),
+    room_rate=getattr(settings, "CHAT_ROOM_RATE", 50),
+    room_burst=getattr(settings, "CHAT_ROOM_BURST", 100),
+    strike_rate=getattr(settings, "CHAT_SOCKET_STRIKE_RATE", 1),
+    strike_burst=getattr(settings, "CHAT_SOCKET_STRIKES", 10),
+    outbox_max=getattr(settings, "WEBSOCKET_OUTBOX_MAX", 256),
+    overflow_ticks=getattr(settings, "WEBSOCKET_OVERFLOW_TICKS", 20),
+)
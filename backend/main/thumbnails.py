@@ -0,0 +1,124 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from .cache import bump_catalog_version
+from .imaging import render_variants
+from .models import Series
+
+VARIANTS_DIR = "series_images/variants"
+
+
+def variant_job(series):
+    """Arguments for ``render_variants`` for the series' current image."""
+    stem = os.path.splitext(os.path.basename(series.image.name))[0]
+    return (
+        default_storage.path(series.image.name),
+        str(settings.MEDIA_ROOT),
+        f"{VARIANTS_DIR}/{series.pk}",
+        stem,
+    )
+
+
+def store_variants(series_id, image_name, source_width, variants):
+    """
+    Record rendered variants, unless the image was replaced meanwhile.
+
+    ``update()`` skips the Series signals, so the catalog cache is bumped here.
+    """
+    stored = Series.objects.filter(pk=series_id, image=image_name).update(
+        image_variants={"source": image_name, "width": source_width, "variants": variants}
+    )
+    if stored:
+        transaction.on_commit(bump_catalog_version)
+    return stored
+
+
+def current_variants(series):
+    """The ``variants`` map if it was rendered from the current image, else ``{}``."""
+    data = series.image_variants or {}
+    if not series.image or data.get("source") != series.image.name:
+        return {}
+    return data.get("variants", {})
+
+
+# ======================================================
+# THUMBNAIL PIPELINE
+# ======================================================
+class ThumbnailPipeline:
+    """
+    Renders Series.image variants in a process pool, off the request path.
+
+    Uploads call ``submit`` once their transaction commits; the pool resizes
+    in separate processes (Pillow work is CPU bound) and the result callback
+    records the variant names on the row. With ``workers=0`` rendering runs
+    inline, which tests and single-process tools rely on.
+    """
+
+    def __init__(self, workers=2):
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.rendered = 0
+        self.failed = 0
+
+    def get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn, not fork: the server process has threads and open sockets.
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def submit(self, series):
+        if not series.image:
+            return None
+        job = variant_job(series)
+        image_name = series.image.name
+        if not self.workers:
+            self._record(series.pk, image_name, lambda: render_variants(*job))
+            return None
+        with self._lock:
+            self.pending += 1
+        future = self.get_pool().submit(render_variants, *job)
+        future.add_done_callback(lambda f: self._record(series.pk, image_name, f.result, pooled=True))
+        return future
+
+    def _record(self, series_id, image_name, render, pooled=False):
+        try:
+            source_width, variants = render()
+            store_variants(series_id, image_name, source_width, variants)
+            self.rendered += 1
+        except Exception as e:
+            self.failed += 1
+            print("⚠️ Error rendering thumbnails:", e)
+        finally:
+            if pooled:
+                # Runs on the pool's result thread: don't keep its DB connection.
+                close_old_connections()
+                with self._lock:
+                    self.pending -= 1
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "rendered": self.rendered,
+            "failed": self.failed,
+        }
+
+
+thumbnail_pipeline = ThumbnailPipeline(workers=getattr(settings, "THUMBNAIL_WORKERS", 2))
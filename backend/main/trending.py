@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import SeriesActivity, TrendingSeries
+
+BUCKET = timedelta(minutes=5)
+WINDOWS = {"1h": timedelta(hours=1), "24h": timedelta(hours=24), "7d": timedelta(days=7)}
+DEFAULT_WINDOW = "24h"
+# A library add says more about interest than one chat line.
+LIBRARY_ADD_WEIGHT = 5
+MESSAGE_WEIGHT = 1
+
+
+def bucket_start(moment):
+    epoch = moment.timestamp()
+    return moment - timedelta(seconds=epoch % BUCKET.total_seconds())
+
+
+def record_activity(library_adds=None, messages=None, now=None):
+    """
+    Add ``{series_id: n}`` counts to the current bucket with one
+    ``INSERT ... ON CONFLICT DO UPDATE`` for all touched series.
+    """
+    library_adds, messages = library_adds or {}, messages or {}
+    series_ids = sorted(set(library_adds) | set(messages))
+    if not series_ids:
+        return
+    bucket = connection.ops.adapt_datetimefield_value(bucket_start(now or timezone.now()))
+    table = connection.ops.quote_name(SeriesActivity._meta.db_table)
+    values, params = [], []
+    for series_id in series_ids:
+        values.append("(%s, %s, %s, %s)")
+        params += [series_id, bucket, library_adds.get(series_id, 0), messages.get(series_id, 0)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (series_id, bucket, library_adds, messages) "
+            f"VALUES {', '.join(values)} "
+            "ON CONFLICT (series_id, bucket) DO UPDATE SET "
+            f"library_adds = {table}.library_adds + excluded.library_adds, "
+            f"messages = {table}.messages + excluded.messages",
+            params,
+        )
+
+
+def rollup_trending(now=None, top_n=None):
+    """
+    Rebuild the ranked TrendingSeries rows for every window from the bucket
+    counters and drop buckets older than the longest window. Meant to run
+    every minute or so; returns ``{window: rows}``.
+    """
+    now = now or timezone.now()
+    top_n = top_n or getattr(settings, "TRENDING_TOP_N", 50)
+    score = Sum(F("library_adds") * LIBRARY_ADD_WEIGHT + F("messages") * MESSAGE_WEIGHT)
+
+    rows, summary = [], {}
+    for window, span in WINDOWS.items():
+        ranked = (
+            SeriesActivity.objects.filter(bucket__gte=bucket_start(now - span) + BUCKET)
+            .values("series_id")
+            .annotate(score=score)
+            .filter(score__gt=0)
+            .order_by("-score", "series_id")[:top_n]
+        )
+        window_rows = [
+            TrendingSeries(window=window, series_id=row["series_id"], score=row["score"], rank=rank)
+            for rank, row in enumerate(ranked, 1)
+        ]
+        rows += window_rows
+        summary[window] = len(window_rows)
+
+    with transaction.atomic():
+        TrendingSeries.objects.all().delete()
+        TrendingSeries.objects.bulk_create(rows)
+        SeriesActivity.objects.filter(bucket__lt=now - max(WINDOWS.values()) - BUCKET).delete()
+    return summary
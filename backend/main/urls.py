@@ -14,6 +14,10 @@ from .views import (
     register_user,
     login_user,
     logout_user,
+    runtime_metrics,
+    my_library,
+    export_my_data,
+    my_recommendations,
 )
 
 router = DefaultRouter()
@@ -31,6 +35,10 @@ urlpatterns = [
     path('register/', register_user, name='register'),
     path('login/', login_user, name='login'),
     path('logout/', logout_user, name='logout'),
+    path('metrics/', runtime_metrics, name='runtime_metrics'),
+    path('library/', my_library, name='my_library'),
+    path('me/export/', export_my_data, name='export_my_data'),
+    path('me/recommendations/', my_recommendations, name='my_recommendations'),
 
     # community messages endpoint
     path('communities/<int:community_id>/messages/', community_messages, name='community_messages'),
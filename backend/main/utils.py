@@ -1,5 +1,17 @@
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from django.utils import timezone
+
+from .buffers import chat_event
+
+# Explicit site-wide channel (new series, new communities). Personal
+# notifications go to the per-user group instead.
+BROADCAST_GROUP = "notifications"
+
+
+def user_notification_group(user_id):
+    return f"notifications_user_{user_id}"
+
 
 def broadcast_notification(message):
     """
@@ -7,6 +19,43 @@ def broadcast_notification(message):
     """
     channel_layer = get_channel_layer()
     async_to_sync(channel_layer.group_send)(
-        "notifications",
+        BROADCAST_GROUP,
         {"type": "send_notification", "message": message}
     )
+
+
+def push_notification(notification):
+    """
+    Push a persisted Notification row to its owner's sockets only.
+    """
+    channel_layer = get_channel_layer()
+    async_to_sync(channel_layer.group_send)(
+        user_notification_group(notification.user_id),
+        {
+            "type": "send_notification",
+            "message": notification.message,
+            "notification": {
+                "id": notification.id,
+                "message": notification.message,
+                "is_read": notification.is_read,
+                "created_at": notification.created_at.isoformat(),
+            },
+        },
+    )
+
+
+def broadcast_chat_message(message):
+    """
+    Send a saved Message to its room's sockets (and their replay rings) in
+    the same frame the chat socket uses.
+    """
+    channel_layer = get_channel_layer()
+    async_to_sync(channel_layer.group_send)(
+        f"chat_{message.community_id}",
+        chat_event(
+            message.seq,
+            message.content,
+            message.user.username,
+            timezone.localtime(message.created_at).strftime("%H:%M"),
+        ),
+    )
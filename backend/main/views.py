@@ -1,13 +1,15 @@
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.shortcuts import get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status, permissions, viewsets, filters
 from rest_framework.decorators import api_view, permission_classes, action
-from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
-from rest_framework.authentication import TokenAuthentication
-from asgiref.sync import async_to_sync
+from django_filters.rest_framework import DjangoFilterBackend
 from channels.layers import get_channel_layer
 
 from .serializers import (
@@ -16,10 +18,14 @@ from .serializers import (
     WishlistSerializer,
     WatchlistSerializer,
     CommunitySerializer,
+    CommunityMemberSerializer,
     MessageSerializer,
     PostSerializer,
     NotificationSerializer,
     CurrentlyWatchingSerializer,
+    SERIES_SUMMARY_FIELDS,
+    requested_fields,
+    expanded_fields,
 )
 from .models import (
     Series,
@@ -30,22 +36,22 @@ from .models import (
     Post,
     Notification,
     CurrentlyWatching,
+    SimilarSeries,
+    TrendingSeries,
+    UserRecommendation,
 )
-
-# ======================================================
-# SAFE TOKEN AUTHENTICATION
-# ======================================================
-class SafeTokenAuthentication(TokenAuthentication):
-    """Prevents logout if token missing or invalid."""
-    def authenticate(self, request):
-        try:
-            auth = super().authenticate(request)
-            if not auth:
-                return None
-            return auth
-        except Exception:
-            return None
-
+from .pagination import KeysetPagination, LargeTablePagination, CreatedAtCursorPagination
+from .search import SeriesSearchFilter, SeriesStatsOrderingFilter
+from .cache import CachedCatalogMixin
+from .buffers import message_buffer, room_history
+from .authentication import SafeTokenAuthentication, token_cache
+from .thumbnails import thumbnail_pipeline
+from .presence import presence
+from .throttling import socket_guard
+from .trending import DEFAULT_WINDOW as DEFAULT_TRENDING_WINDOW, WINDOWS as TRENDING_WINDOWS
+from .exports import message_records, parse_time_range, streaming_export, user_records
+from . import counters
+from .utils import broadcast_chat_message, broadcast_notification
 
 # ======================================================
 # CUSTOM PERMISSIONS
@@ -65,6 +71,7 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [AllowAny]
+    pagination_class = LargeTablePagination
 
 
 # ======================================================
@@ -144,32 +151,176 @@ def logout_user(request):
 # ======================================================
 # SERIES VIEWSET — Only Admins Can Modify
 # ======================================================
-class SeriesViewSet(viewsets.ModelViewSet):
+class SeriesViewSet(CachedCatalogMixin, viewsets.ModelViewSet):
     authentication_classes = [SafeTokenAuthentication]
-    queryset = Series.objects.all().order_by("-id")
+    queryset = Series.objects.select_related("stats").order_by("-id")
     serializer_class = SeriesSerializer
     permission_classes = [IsAdminOrReadOnly]
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [SeriesSearchFilter, DjangoFilterBackend, SeriesStatsOrderingFilter]
     search_fields = ["title", "description"]
+    filterset_fields = ["genre", "release_year"]
 
     def perform_create(self, serializer):
         series = serializer.save()
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            "notifications",
-            {"type": "send_notification", "message": f"New Dizi added: {series.title}"},
+        broadcast_notification(f"New Dizi added: {series.title}")
+
+    @action(detail=False, methods=["get"])
+    def trending(self, request):
+        """Top series for ``?window=1h|24h|7d``, as of the last rollup."""
+        window = request.query_params.get("window", DEFAULT_TRENDING_WINDOW)
+        if window not in TRENDING_WINDOWS:
+            return Response({"error": f"window must be one of {', '.join(TRENDING_WINDOWS)}"}, status=400)
+        rows = (
+            TrendingSeries.objects.filter(window=window)
+            .select_related("series__stats")
+            .order_by("rank")[: ranked_limit(request, "TRENDING_TOP_N", 50)]
+        )
+        return ranked_series_response(request, rows, "series")
+
+    @action(detail=True, methods=["get"])
+    def similar(self, request, pk=None):
+        """Neighbours ("also watched") read from the precomputed table."""
+        rows = (
+            SimilarSeries.objects.filter(series_id=pk)
+            .select_related("similar__stats")
+            .order_by("rank")[: ranked_limit(request, "RECOMMENDATION_TOP_K", 20)]
+        )
+        return ranked_series_response(request, rows, "similar")
+
+
+# ======================================================
+# LIBRARY — SPARSE FIELDSETS
+# ======================================================
+class SparseFieldsetMixin:
+    """Load only the columns a ``?fields=`` request will actually render."""
+
+    def sparse_queryset(self, queryset):
+        requested = requested_fields(self.request)
+        if requested is None:
+            return queryset
+        model_fields = {f.name for f in queryset.model._meta.concrete_fields}
+        columns, relations = {"id"}, set()
+        for name in requested:
+            if name == "user":
+                relations.add("user")
+                columns.add("user__username")
+            elif name == "series":
+                relations.add("series")
+                if "series" in expanded_fields(self.request):
+                    # srcset is computed from image_variants, stats from SeriesStats
+                    relations.add("series__stats")
+                    series_fields = [
+                        f for f in SeriesSerializer.Meta.fields if f not in ("srcset", "stats")
+                    ] + ["image_variants"]
+                else:
+                    series_fields = SERIES_SUMMARY_FIELDS
+                columns.update(f"series__{field}" for field in series_fields)
+            elif name == "series_title":
+                relations.add("series")
+                columns.add("series__title")
+            elif name in model_fields:
+                columns.add(name)
+        return queryset.select_related(None).select_related(*relations).only(*columns, *relations)
+
+
+# ======================================================
+# LIBRARY — BULK ADD / REMOVE
+# ======================================================
+class BulkLibraryMixin:
+    """
+    ``POST <list>/bulk/`` adds and ``DELETE <list>/bulk/`` removes many series
+    at once from ``{"series_ids": [...]}``, in a fixed number of queries.
+    The response maps every requested id to its outcome.
+    """
+    library_model = None
+    max_bulk_ids = 500
+
+    @action(detail=False, methods=["post", "delete"], url_path="bulk")
+    def bulk(self, request):
+        series_ids, results = self.parse_bulk_ids(request.data.get("series_ids"))
+        if series_ids is None:
+            return Response(
+                {"error": f"series_ids must be a list of at most {self.max_bulk_ids} ids"},
+                status=400,
+            )
+        rows = self.library_model.objects.filter(user=request.user, series_id__in=series_ids)
+        if request.method == "DELETE":
+            present = self.bulk_remove(request.user, rows)
+            for series_id in series_ids:
+                results[series_id] = "removed" if series_id in present else "not_present"
+            return Response(self.bulk_summary(results), status=200)
+
+        present = set(rows.values_list("series_id", flat=True))
+
+        existing = set(
+            Series.objects.filter(id__in=series_ids - present).values_list("id", flat=True)
+        )
+        inserted = counters.insert_library_rows(self.library_model, request.user.id, existing)
+        # The raw insert skips the library signals; count only rows it added.
+        counters.library_changed(
+            request.user.id, inserted, added=True,
+            stats=counters.library_stat_deltas(self.library_model()),
         )
+        for series_id in series_ids:
+            if series_id in inserted:
+                results[series_id] = "added"
+            elif series_id in present or series_id in existing:
+                results[series_id] = "already_present"
+            else:
+                results[series_id] = "not_found"
+        return Response(self.bulk_summary(results), status=200)
+
+    def bulk_remove(self, user, rows):
+        """
+        Delete ``rows`` with the per-row post_delete hooks skipped, then
+        apply them once: one change-queue insert and one stats UPDATE per
+        distinct delta (a Watchlist row's depends on its status and rating).
+        """
+        with transaction.atomic():
+            removed = list(rows.select_for_update())
+            # Only the rows read (and counted) here: one inserted meanwhile stays.
+            doomed = self.library_model.objects.filter(pk__in=[row.pk for row in removed])
+            doomed.library_hooks_applied = True  # see signals.library_row_removed
+            doomed.delete()
+            counters.library_changed(user.id, [row.series_id for row in removed], added=False)
+            by_deltas = {}
+            for row in removed:
+                deltas = tuple(counters.library_stat_deltas(row, sign=-1).items())
+                by_deltas.setdefault(deltas, []).append(row.series_id)
+            for deltas, series_ids in by_deltas.items():
+                counters.adjust_series_stats(series_ids, dict(deltas))
+        return {row.series_id for row in removed}
+
+    def parse_bulk_ids(self, raw_ids):
+        if not isinstance(raw_ids, list) or len(raw_ids) > self.max_bulk_ids:
+            return None, None
+        series_ids, results = set(), {}
+        for raw in raw_ids:
+            try:
+                series_ids.add(int(raw))
+            except (TypeError, ValueError):
+                results[str(raw)] = "invalid"
+        return series_ids, results
+
+    def bulk_summary(self, results):
+        totals = {}
+        for outcome in results.values():
+            totals[outcome] = totals.get(outcome, 0) + 1
+        return {"results": {str(k): v for k, v in results.items()}, "totals": totals}
 
 
 # ======================================================
 # WISHLIST VIEWSET
 # ======================================================
-class WishlistViewSet(viewsets.ModelViewSet):
+class WishlistViewSet(SparseFieldsetMixin, BulkLibraryMixin, viewsets.ModelViewSet):
+    library_model = Wishlist
     serializer_class = WishlistSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Wishlist.objects.filter(user=self.request.user)
+        return self.sparse_queryset(
+            Wishlist.objects.filter(user=self.request.user).select_related("user", "series__stats")
+        )
 
     def create(self, request, *args, **kwargs):
         series_id = request.data.get("series_id")
@@ -188,12 +339,18 @@ class WishlistViewSet(viewsets.ModelViewSet):
 # ======================================================
 # WATCHLIST VIEWSET
 # ======================================================
-class WatchlistViewSet(viewsets.ModelViewSet):
+class WatchlistViewSet(SparseFieldsetMixin, BulkLibraryMixin, viewsets.ModelViewSet):
+    library_model = Watchlist
     serializer_class = WatchlistSerializer
     permission_classes = [IsAuthenticated]
+    filterset_fields = ["status"]
 
     def get_queryset(self):
-        return Watchlist.objects.filter(user=self.request.user)
+        return self.sparse_queryset(
+            Watchlist.objects.filter(user=self.request.user)
+            .select_related("user", "series__stats")
+            .order_by("-id")
+        )
 
     def create(self, request, *args, **kwargs):
         series_id = request.data.get("series_id")
@@ -212,12 +369,17 @@ class WatchlistViewSet(viewsets.ModelViewSet):
 # ======================================================
 # CURRENTLY WATCHING VIEWSET
 # ======================================================
-class CurrentlyWatchingViewSet(viewsets.ModelViewSet):
+class CurrentlyWatchingViewSet(SparseFieldsetMixin, BulkLibraryMixin, viewsets.ModelViewSet):
+    library_model = CurrentlyWatching
     serializer_class = CurrentlyWatchingSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return CurrentlyWatching.objects.filter(user=self.request.user)
+        return self.sparse_queryset(
+            CurrentlyWatching.objects.filter(user=self.request.user)
+            .select_related("user", "series__stats")
+            .order_by("-started_at")
+        )
 
     def create(self, request, *args, **kwargs):
         series_id = request.data.get("series_id")
@@ -233,11 +395,124 @@ class CurrentlyWatchingViewSet(viewsets.ModelViewSet):
         return Response(self.get_serializer(watching_item).data, status=201)
 
 
+# ======================================================
+# MY LIBRARY — all three lists in one response
+# ======================================================
+LIBRARY_SECTIONS = {
+    "wishlist": (Wishlist, ["id", "series_id", "added_at"], "-added_at"),
+    "watchlist": (Watchlist, ["id", "series_id", "status", "notes", "rating"], "-id"),
+    "currently_watching": (CurrentlyWatching, ["id", "series_id", "started_at"], "-started_at"),
+}
+LIBRARY_DEFAULT_LIMIT = 20
+LIBRARY_MAX_LIMIT = 100
+
+
+def parse_non_negative(value, default, maximum=None):
+    try:
+        value = max(0, int(value))
+    except (TypeError, ValueError):
+        return default
+    return min(value, maximum) if maximum is not None else value
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def my_library(request):
+    """
+    Wishlist, watchlist and currently-watching for the current user in four
+    queries: one per section plus one for every series they reference.
+    Sections page independently via ``?<section>_offset=`` and ``?limit=``;
+    series are emitted once in ``series`` and referenced by id.
+    """
+    limit = parse_non_negative(
+        request.query_params.get("limit"), LIBRARY_DEFAULT_LIMIT, LIBRARY_MAX_LIMIT
+    ) or LIBRARY_DEFAULT_LIMIT
+    payload, series_ids = {}, set()
+    for name, (model, fields, ordering) in LIBRARY_SECTIONS.items():
+        offset = parse_non_negative(request.query_params.get(f"{name}_offset"), 0)
+        rows = list(
+            model.objects.filter(user=request.user)
+            .order_by(ordering, "-id")
+            .values(*fields)[offset : offset + limit + 1]
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        for row in rows:
+            row["series"] = row.pop("series_id")
+            series_ids.add(row["series"])
+        payload[name] = {
+            "offset": offset,
+            "next_offset": offset + limit if has_more else None,
+            "results": rows,
+        }
+
+    series = (
+        Series.objects.filter(id__in=series_ids).select_related("stats")
+        if series_ids else Series.objects.none()
+    )
+    payload["series"] = {
+        str(item["id"]): item
+        for item in SeriesSerializer(series, many=True, context={"request": request}).data
+    }
+    return Response(payload, status=200)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_my_data(request):
+    """The current user's library, posts, messages and notifications as NDJSON."""
+    try:
+        time_range = parse_time_range(
+            request.query_params.get("since"), request.query_params.get("until")
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    return streaming_export(
+        request._request,
+        user_records(request.user, time_range),
+        f"{request.user.username}-export.ndjson",
+        compress=request.query_params.get("compress") == "gzip",
+    )
+
+
+# ======================================================
+# RECOMMENDATIONS (precomputed, see main/recommendations.py)
+# ======================================================
+def ranked_limit(request, setting, default):
+    """``?limit=`` capped at the number of rows precomputed per key."""
+    stored = getattr(settings, setting, default)
+    return parse_non_negative(request.query_params.get("limit"), stored, stored) or stored
+
+
+def ranked_series_response(request, rows, attr):
+    rows = list(rows)
+    data = SeriesSerializer(
+        [getattr(row, attr) for row in rows], many=True, context={"request": request}
+    ).data
+    return Response(
+        {"results": [{**item, "score": round(row.score, 4)} for item, row in zip(data, rows)]},
+        status=200,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def my_recommendations(request):
+    rows = (
+        UserRecommendation.objects.filter(user=request.user)
+        .select_related("series__stats")
+        .order_by("rank")[: ranked_limit(request, "RECOMMENDATION_TOP_K", 20)]
+    )
+    return ranked_series_response(request, rows, "series")
+
+
 # ======================================================
 # COMMUNITY VIEWSET
 # ======================================================
 class CommunityViewSet(viewsets.ModelViewSet):
-    queryset = Community.objects.all().order_by("-created_at")
+    queryset = (
+        Community.objects.select_related("series", "created_by").order_by("-created_at")
+    )
     serializer_class = CommunitySerializer
     permission_classes = [AllowAny]
     filter_backends = [filters.SearchFilter]
@@ -246,32 +521,64 @@ class CommunityViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         user = self.request.user if self.request.user.is_authenticated else User.objects.first()
         community = serializer.save(created_by=user)
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            "notifications",
-            {
-                "type": "send_notification",
-                "message": f"New community opened for {community.series.title} ({community.language})!",
-            },
+        broadcast_notification(
+            f"New community opened for {community.series.title} ({community.language})!"
+        )
+
+    def get_membership_target(self, pk):
+        """Just the columns join/leave need — no member prefetch."""
+        return get_object_or_404(
+            Community.objects.select_related("series").only("id", "series__title"), pk=pk
+        )
+
+    @action(detail=True, methods=["get"], permission_classes=[IsAdminUser])
+    def export(self, request, pk=None):
+        """Full chat history as NDJSON (``?since=&until=``, ``?compress=gzip``)."""
+        community = get_object_or_404(Community.objects.only("id"), pk=pk)
+        try:
+            time_range = parse_time_range(
+                request.query_params.get("since"), request.query_params.get("until")
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        return streaming_export(
+            request._request,
+            message_records(community.id, time_range),
+            f"community-{community.id}-messages.ndjson",
+            compress=request.query_params.get("compress") == "gzip",
+        )
+
+    @action(detail=True, methods=["get"])
+    def members(self, request, pk=None):
+        """Members a page at a time; the community payload only carries member_count."""
+        get_object_or_404(Community.objects.only("id"), pk=pk)
+        paginator = LargeTablePagination()
+        page = paginator.paginate_queryset(
+            User.objects.filter(joined_communities=pk).only("id", "username"), request, view=self
         )
+        return paginator.get_paginated_response(CommunityMemberSerializer(page, many=True).data)
+
+    @action(detail=True, methods=["get"])
+    def presence(self, request, pk=None):
+        """Open chat sockets in the room, across all workers."""
+        community = get_object_or_404(Community.objects.only("id", "online_count"), pk=pk)
+        return Response({"community": community.id, "online": community.online_count}, status=200)
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
     def join(self, request, pk=None):
-        community = self.get_object()
+        community = self.get_membership_target(pk)
         user = request.user
-        if community.members.filter(id=user.id).exists():
+        if not counters.join_community(community.id, user.id):
             return Response({"message": "Already a member"}, status=200)
-        community.members.add(user)
         Notification.objects.create(user=user, message=f"You joined {community.series.title} community!")
         return Response({"message": "Joined successfully"}, status=200)
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
     def leave(self, request, pk=None):
-        community = self.get_object()
+        community = self.get_membership_target(pk)
         user = request.user
-        if not community.members.filter(id=user.id).exists():
+        if not counters.leave_community(community.id, user.id):
             return Response({"message": "Not a member"}, status=400)
-        community.members.remove(user)
         Notification.objects.create(user=user, message=f"You left {community.series.title} community.")
         return Response({"message": "Left successfully"}, status=200)
 
@@ -280,13 +587,19 @@ class CommunityViewSet(viewsets.ModelViewSet):
 # MESSAGE VIEWSET + COMMUNITY MESSAGES ENDPOINT
 # ======================================================
 class MessageViewSet(viewsets.ModelViewSet):
-    queryset = Message.objects.all().order_by("created_at")
+    queryset = Message.objects.select_related("user").order_by("created_at")
     serializer_class = MessageSerializer
     permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
+    filterset_fields = ["community"]
 
     def perform_create(self, serializer):
         user = self.request.user if self.request.user.is_authenticated else User.objects.first()
-        serializer.save(user=user)
+        community = serializer.validated_data["community"]
+        # Reserve the seq in the saving transaction so a failed save returns it.
+        with transaction.atomic():
+            message = serializer.save(user=user, seq=counters.next_message_seq(community.id))
+            transaction.on_commit(lambda: broadcast_chat_message(message))
 
 
 @api_view(["GET"])
@@ -294,24 +607,74 @@ class MessageViewSet(viewsets.ModelViewSet):
 def community_messages(request, community_id):
     if not Community.objects.filter(id=community_id).exists():
         return Response({"error": "Community not found"}, status=404)
-    messages = Message.objects.filter(community_id=community_id).order_by("created_at")
+    paginator = KeysetPagination()
+    messages = paginator.paginate_queryset(
+        Message.objects.filter(community_id=community_id).select_related("user"), request
+    )
     serializer = MessageSerializer(messages, many=True)
-    return Response(serializer.data, status=200)
+    return paginator.get_paginated_response(serializer.data)
 
 
 # ======================================================
 # POST VIEWSET
 # ======================================================
 class PostViewSet(viewsets.ModelViewSet):
-    queryset = Post.objects.all()
+    queryset = Post.objects.select_related("community__series", "user")
     serializer_class = PostSerializer
     permission_classes = [AllowAny]
+    pagination_class = CreatedAtCursorPagination
+    filterset_fields = ["community"]
 
 
 # ======================================================
 # NOTIFICATION VIEWSET
 # ======================================================
 class NotificationViewSet(viewsets.ModelViewSet):
-    queryset = Notification.objects.all().order_by("-created_at")
+    queryset = Notification.objects.select_related("user").order_by("-created_at")
     serializer_class = NotificationSerializer
     permission_classes = [AllowAny]
+    pagination_class = CreatedAtCursorPagination
+    filterset_fields = ["user", "is_read"]
+
+    @action(detail=False, methods=["get"], url_path="unread-count", permission_classes=[IsAuthenticated])
+    def unread_count(self, request):
+        return Response({"unread": counters.unread_count(request.user.id)}, status=200)
+
+    @action(detail=False, methods=["post"], url_path="mark-all-read", permission_classes=[IsAuthenticated])
+    def mark_all_read(self, request):
+        marked = counters.mark_read(request.user.id)
+        return Response({"marked": marked, "unread": counters.unread_count(request.user.id)}, status=200)
+
+    @action(detail=False, methods=["post"], url_path="mark-read", permission_classes=[IsAuthenticated])
+    def mark_read(self, request):
+        raw_ids = request.query_params.get("ids") or request.data.get("ids") or ""
+        if isinstance(raw_ids, str):
+            raw_ids = raw_ids.split(",")
+        try:
+            ids = {int(i) for i in raw_ids if str(i).strip()}
+        except (TypeError, ValueError):
+            return Response({"error": "ids must be a comma-separated list of integers"}, status=400)
+        if not ids:
+            return Response({"error": "ids is required"}, status=400)
+        marked = counters.mark_read(request.user.id, ids)
+        return Response({"marked": marked, "unread": counters.unread_count(request.user.id)}, status=200)
+
+
+# ======================================================
+# RUNTIME METRICS (per worker process)
+# ======================================================
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def runtime_metrics(request):
+    metrics = {
+        "chat_buffer": message_buffer.stats(),
+        "chat_replay": room_history.stats(),
+        "presence": presence.stats(),
+        "websockets": socket_guard.stats(),
+        "token_cache": token_cache.stats(),
+        "thumbnails": thumbnail_pipeline.stats(),
+    }
+    channel_layer = get_channel_layer()
+    if hasattr(channel_layer, "stats"):
+        metrics["channel_layer"] = channel_layer.stats()
+    return Response(metrics, status=200)